@@ -0,0 +1,118 @@
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from prehab.helpers.HttpException import HttpException
+from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
+
+
+class AdherenceExport:
+    """
+    Patient task schedule joined with its task, prehab and patient, written as CSV or NDJSON while the rows are read
+    from a server-side cursor (queryset.iterator), so exports of any size run in constant memory.
+    """
+    # Rows fetched from the database at a time
+    CHUNK_SIZE = 2000
+
+    # (column, lookup)
+    COLUMNS = (
+        ('patient_task_schedule_id', 'id'),
+        ('prehab_id', 'prehab_id'),
+        ('prehab_status', 'prehab__status'),
+        ('doctor_id', 'prehab__created_by_id'),
+        ('patient_id', 'prehab__patient_id'),
+        ('patient_tag', 'prehab__patient__patient_tag'),
+        ('patient_age', 'prehab__patient__age'),
+        ('patient_sex', 'prehab__patient__sex'),
+        ('task_id', 'task_id'),
+        ('task_title', 'task__title'),
+        ('task_type', 'task__task_type'),
+        ('week_number', 'week_number'),
+        ('day_number', 'day_number'),
+        ('date', 'date'),
+        ('status', 'status'),
+        ('finished_date', 'finished_date'),
+        ('expected_repetitions', 'expected_repetitions'),
+        ('actual_repetitions', 'actual_repetitions'),
+        ('was_difficult', 'was_difficult'),
+        ('seen_by_doctor', 'seen_by_doctor'),
+    )
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson'
+    }
+
+    @staticmethod
+    def queryset(doctor_id=None, date_from=None, date_to=None, status=None):
+        """ Rows to export, as tuples in COLUMNS order. Dates filter the day of the task (dated by the cron job). """
+        patient_tasks = PatientTaskSchedule.objects.all()
+        if doctor_id is not None:
+            patient_tasks = patient_tasks.filter(prehab__created_by_id=doctor_id)
+        # Range on the column itself, so the index on date can be used
+        if date_from is not None:
+            patient_tasks = patient_tasks.filter(date__gte=AdherenceExport._start_of_day(date_from))
+        if date_to is not None:
+            patient_tasks = patient_tasks.filter(date__lt=AdherenceExport._start_of_day(date_to + datetime.timedelta(days=1)))
+        if status is not None:
+            patient_tasks = patient_tasks.filter(status=status)
+
+        return patient_tasks.order_by('id').values_list(*[lookup for column, lookup in AdherenceExport.COLUMNS])
+
+    @staticmethod
+    def _start_of_day(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+    @staticmethod
+    def lines(export_type, rows):
+        """ Encoded lines of the rows, header included """
+        if export_type not in AdherenceExport.CONTENT_TYPES:
+            raise HttpException(400, 'Tipo de exportação inválido.',
+                                'Invalid export type {}. Use one of: {}.'.format(
+                                    export_type, ', '.join(AdherenceExport.CONTENT_TYPES)))
+
+        rows = rows.iterator(chunk_size=AdherenceExport.CHUNK_SIZE)
+        if export_type == 'csv':
+            return AdherenceExport._csv_lines(rows)
+
+        return AdherenceExport._ndjson_lines(rows)
+
+    @staticmethod
+    def parse_filters(params):
+        """ Filters from query parameters / command options: doctor_id, date_from, date_to (dd-mm-yyyy), status """
+        try:
+            return {
+                'doctor_id': int(params['doctor_id']) if params.get('doctor_id') else None,
+                'date_from': AdherenceExport._parse_date(params['date_from']) if params.get('date_from') else None,
+                'date_to': AdherenceExport._parse_date(params['date_to']) if params.get('date_to') else None,
+                'status': int(params['status']) if params.get('status') else None
+            }
+        except ValueError as e:
+            raise HttpException(400, 'Filtros de exportação inválidos.', 'Invalid export filters. {}.'.format(str(e)))
+
+    @staticmethod
+    def _parse_date(value):
+        return datetime.datetime.strptime(value, '%d-%m-%Y').date()
+
+    @staticmethod
+    def _csv_lines(rows):
+        # csv.writer writes to anything with a write method - this one gives the line back
+        writer = csv.writer(_Line())
+        yield writer.writerow([column for column, lookup in AdherenceExport.COLUMNS])
+        for row in rows:
+            yield writer.writerow(row)
+
+    @staticmethod
+    def _ndjson_lines(rows):
+        columns = [column for column, lookup in AdherenceExport.COLUMNS]
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+class _Line:
+    @staticmethod
+    def write(value):
+        return value
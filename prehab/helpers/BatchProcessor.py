@@ -0,0 +1,66 @@
+import math
+
+from django.db import transaction
+
+from prehab_app.models.CronJobState import CronJobState
+
+
+class BatchProcessor:
+    """
+    Runs a job over a queryset in chunks of primary keys, each chunk in its own transaction.
+    Chunks are found with keyset pagination (pk > last pk ORDER BY pk LIMIT size), so no ids are loaded up front,
+    and the last pk of every committed chunk is saved as a resume cursor: a run that gets killed continues,
+    on the same day, from where it stopped. A dry run always goes through the whole queryset, so it reports everything
+    a run would do, and leaves the cursor alone.
+    """
+
+    DEFAULT_CHUNK_SIZE = 500
+
+    def __init__(self, job, queryset, today, chunk_size=None, dry_run=False, progress=None):
+        self.job = job
+        self.queryset = queryset.order_by('pk')
+        self.today = today
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.dry_run = dry_run
+        self.progress = progress
+
+    def run(self, process_chunk):
+        """
+        Call process_chunk(first_pk, last_pk) for every chunk and sum the counters it returns.
+        :return: dict with the summed counters and the cursor the run was resumed from - for a dry run, the cursor
+        left by an interrupted run instead, which a real run would resume from
+        """
+        cursor = CronJobState.objects.get_cursor(self.job, self.today)
+        if self.dry_run:
+            result = {'interrupted_at': cursor}
+            cursor = None
+        else:
+            result = {'resumed_from': cursor}
+
+        remaining = self._pending(cursor).count()
+        number_of_chunks = math.ceil(remaining / self.chunk_size)
+        for chunk_number in range(1, number_of_chunks + 1):
+            pks = list(self._pending(cursor).values_list('pk', flat=True)[:self.chunk_size])
+            if len(pks) == 0:
+                break
+
+            with transaction.atomic():
+                counters = process_chunk(pks[0], pks[-1])
+                if self.dry_run:
+                    transaction.set_rollback(True)
+                else:
+                    CronJobState.objects.set_cursor(self.job, pks[-1], self.today)
+
+            cursor = pks[-1]
+            for counter, value in counters.items():
+                result[counter] = result.get(counter, 0) + value
+            if self.progress is not None:
+                self.progress(chunk_number, number_of_chunks, result)
+
+        if not self.dry_run:
+            CronJobState.objects.set_cursor(self.job, None, None)
+
+        return result
+
+    def _pending(self, cursor):
+        return self.queryset if cursor is None else self.queryset.filter(pk__gt=cursor)
@@ -0,0 +1,74 @@
+import io
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import AutoField
+
+
+class BulkWriter:
+    """
+    Inserts many rows of a model at once. On PostgreSQL the rows are written to an in-memory buffer and loaded with
+    COPY FROM STDIN, otherwise they go through bulk_create in batches.
+    Like bulk_create, save() is not called and no signals are sent. Rows loaded with COPY don't get their pk set.
+    """
+
+    @staticmethod
+    def insert(model, objs, batch_size=None):
+        """ Insert the objects and return how many were inserted """
+        batch_size = batch_size or settings.BULK_WRITER_BATCH_SIZE
+        connection = connections[router.db_for_write(model)]
+        fields = [field for field in model._meta.concrete_fields if not isinstance(field, AutoField)]
+
+        if connection.vendor == 'postgresql':
+            return BulkWriter._copy(connection, model, fields, objs, batch_size)
+
+        # bulk_create doesn't cap the batch size to what the database accepts
+        objs = list(objs)
+        batch_size = min(batch_size, max(connection.ops.bulk_batch_size(fields, objs), 1))
+        return len(model.objects.bulk_create(objs, batch_size=batch_size))
+
+    @staticmethod
+    def _copy(connection, model, fields, objs, batch_size):
+        sql = 'COPY {} ({}) FROM STDIN'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        )
+
+        total = 0
+        with connection.cursor() as cursor:
+            buffer = io.StringIO()
+            rows = 0
+            for obj in objs:
+                buffer.write(BulkWriter.copy_line(
+                    field.get_db_prep_save(field.pre_save(obj, add=True), connection) for field in fields
+                ))
+                rows += 1
+                if rows == batch_size:
+                    total += BulkWriter._flush(cursor, sql, buffer, rows)
+                    buffer, rows = io.StringIO(), 0
+
+            total += BulkWriter._flush(cursor, sql, buffer, rows)
+
+        return total
+
+    @staticmethod
+    def _flush(cursor, sql, buffer, rows):
+        if rows:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+
+        return rows
+
+    @staticmethod
+    def copy_line(values):
+        """ Row in the text format of COPY """
+        return '\t'.join(BulkWriter._copy_value(value) for value in values) + '\n'
+
+    @staticmethod
+    def _copy_value(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
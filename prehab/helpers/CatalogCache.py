@@ -0,0 +1,35 @@
+from prehab_app.models.Meal import Meal
+from prehab_app.models.Task import Task
+from prehab_app.serializers.Meal import MealSerializer
+from prehab_app.serializers.Task import FullTaskSerializer
+
+
+class CatalogCache:
+    """
+    Process-local cache of the serialized Task and Meal catalogs, indexed by id.
+    The catalogs are small and only grow, so they are loaded at once and reloaded when an unknown id is asked for
+    (rows added by other processes) or when invalidated by this process.
+    """
+    _tasks = None
+    _meals = None
+
+    @staticmethod
+    def task(task_id):
+        """ Copy of the FullTaskSerializer data of the task. """
+        if CatalogCache._tasks is None or task_id not in CatalogCache._tasks:
+            CatalogCache._tasks = {task['id']: task for task in FullTaskSerializer(Task.objects.all(), many=True).data}
+
+        return dict(CatalogCache._tasks[task_id])
+
+    @staticmethod
+    def meal(meal_id):
+        """ Copy of the MealSerializer data of the meal. """
+        if CatalogCache._meals is None or meal_id not in CatalogCache._meals:
+            CatalogCache._meals = {meal['id']: meal for meal in MealSerializer(Meal.objects.all(), many=True).data}
+
+        return dict(CatalogCache._meals[meal_id])
+
+    @staticmethod
+    def invalidate():
+        CatalogCache._tasks = None
+        CatalogCache._meals = None
@@ -0,0 +1,180 @@
+import datetime
+import time
+
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from django.utils import timezone
+
+from prehab.helpers.BatchProcessor import BatchProcessor
+from prehab_app.models.CronJobState import CronJobState
+from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
+from prehab_app.models.Prehab import Prehab
+from prehab_app.models.PrehabStatistics import PrehabStatistics
+
+
+class CronHelper:
+    PREHAB_EXPIRATION_DAYS = 30
+
+    # date = init_date + 7 * (week_number - 1) + (day_number - 1) days, only for undated tasks of active prehabs.
+    # Other databases go through the ORM (see _update_task_dates_by_prehab)
+    TASK_DATE_SQL = {
+        'postgresql': '''
+            UPDATE patient_task_schedule AS pts
+            SET date = p.init_date + (7 * (pts.week_number - 1) + pts.day_number - 1),
+                updated_at = %s,
+                change_seq = p.change_seq
+            FROM prehab AS p
+            WHERE pts.prehab_id = p.id
+              AND p.status < %s
+              AND pts.prehab_id BETWEEN %s AND %s
+              AND pts.date IS NULL
+        ''',
+        'sqlite': '''
+            UPDATE patient_task_schedule
+            SET date = (
+                SELECT datetime(p.init_date, '+' || (7 * (week_number - 1) + day_number - 1) || ' days')
+                FROM prehab AS p
+                WHERE p.id = patient_task_schedule.prehab_id
+            ),
+            updated_at = %s,
+            change_seq = (SELECT change_seq FROM prehab WHERE id = patient_task_schedule.prehab_id)
+            WHERE prehab_id IN (SELECT id FROM prehab WHERE status < %s)
+              AND prehab_id BETWEEN %s AND %s
+              AND date IS NULL
+        '''
+    }
+
+    @staticmethod
+    def clean_tasks(today=None, since=None, chunk_size=None, dry_run=False, progress=None):
+        """
+        Date the new tasks of the active prehabs and mark the overdue pending ones as not completed.
+        Only tasks dated between the last run (watermark, or `since`) and today are looked at, plus the ones dated
+        in this run, so missed runs are caught up and the work done is proportional to the days elapsed.
+        Prehabs are processed in chunks of `chunk_size` (see BatchProcessor).
+        """
+        today = today or datetime.date.today()
+        start = time.time()
+        watermark = since or CronJobState.objects.get_watermark(CronJobState.CLEAN_TASKS)
+        result = {
+            'watermark': watermark,
+            'dates_updated': 0,
+            'tasks_expired': 0
+        }
+
+        processor = BatchProcessor(CronJobState.CLEAN_TASKS, Prehab.objects.filter(status__lt=Prehab.COMPLETED),
+                                   today, chunk_size, dry_run, progress)
+        # Every prehab changed gets a new change_seq, which also invalidates its cached plan (see PrehabCache)
+        result.update(processor.run(
+            lambda first_id, last_id: CronHelper._clean_tasks_chunk(first_id, last_id, watermark, today)
+        ))
+
+        if not dry_run:
+            CronJobState.objects.set_watermark(CronJobState.CLEAN_TASKS, today)
+
+        result['elapsed_time'] = round(time.time() - start, 3)
+        return result
+
+    @staticmethod
+    def clean_prehabs(today=None, since=None, chunk_size=None, dry_run=False, progress=None):
+        """
+        Start the pending prehabs whose init date arrived and cancel the ongoing ones 30 days after their expected end.
+        Each transition is a single conditional update per chunk of `chunk_size` prehabs (see BatchProcessor).
+        With `since`, only the transitions due since that day are done.
+        """
+        today = today or datetime.date.today()
+        start = time.time()
+        result = {
+            'prehabs_started': 0,
+            'prehabs_canceled': 0
+        }
+
+        processor = BatchProcessor(CronJobState.CLEAN_PREHABS, Prehab.objects.filter(status__lt=Prehab.COMPLETED),
+                                   today, chunk_size, dry_run, progress)
+        # Every prehab changed gets a new change_seq, which also invalidates its cached plan (see PrehabCache)
+        result.update(processor.run(
+            lambda first_id, last_id: CronHelper._clean_prehabs_chunk(first_id, last_id, since, today)
+        ))
+
+        result['elapsed_time'] = round(time.time() - start, 3)
+        return result
+
+    @staticmethod
+    def _clean_tasks_chunk(first_prehab_id, last_prehab_id, watermark, today):
+        # 1. Tasks created since the last run don't have a date yet
+        active_tasks = PatientTaskSchedule.objects.filter(prehab__status__lt=Prehab.COMPLETED,
+                                                          prehab_id__gte=first_prehab_id,
+                                                          prehab_id__lte=last_prehab_id)
+        new_prehab_ids = list(active_tasks.filter(date__isnull=True).order_by()
+                              .values_list('prehab_id', flat=True).distinct())
+        dates_updated = 0
+        if len(new_prehab_ids) > 0:
+            Prehab.objects.filter(id__in=new_prehab_ids).next_change_seq()
+            dates_updated = CronHelper._update_task_dates(first_prehab_id, last_prehab_id, new_prehab_ids)
+
+        # 2. Expire pending tasks of the days elapsed since the last run (and of the tasks dated just now)
+        overdue_tasks = active_tasks.filter(status=PatientTaskSchedule.PENDING,
+                                            date__lt=CronHelper._start_of_day(today))
+        if watermark is not None:
+            overdue_tasks = overdue_tasks.filter(Q(date__gte=CronHelper._start_of_day(watermark)) |
+                                                 Q(prehab_id__in=new_prehab_ids))
+        prehab_ids = list(overdue_tasks.order_by().values_list('prehab_id', flat=True).distinct())
+        tasks_expired = overdue_tasks.update_changed(status=PatientTaskSchedule.NOT_COMPLETED)
+
+        PrehabStatistics.objects.rebuild(prehab_ids)
+
+        return {
+            'dates_updated': dates_updated,
+            'tasks_expired': tasks_expired
+        }
+
+    @staticmethod
+    def _clean_prehabs_chunk(first_prehab_id, last_prehab_id, since, today):
+        expiration = datetime.timedelta(days=CronHelper.PREHAB_EXPIRATION_DAYS)
+        prehabs = Prehab.objects.filter(id__gte=first_prehab_id, id__lte=last_prehab_id)
+        prehabs_to_cancel = prehabs.filter(status=Prehab.ONGOING, expected_end_date__lte=today - expiration)
+        prehabs_to_start = prehabs.filter(status=Prehab.PENDING, init_date__lte=today)
+        if since is not None:
+            prehabs_to_cancel = prehabs_to_cancel.filter(expected_end_date__gte=since - expiration)
+            prehabs_to_start = prehabs_to_start.filter(init_date__gte=since)
+
+        # Cancel before starting, so a prehab is never started and canceled in the same run
+        return {
+            'prehabs_canceled': prehabs_to_cancel.update(status=Prehab.CANCEL, actual_end_date=today,
+                                                         change_seq=F('change_seq') + 1),
+            'prehabs_started': prehabs_to_start.update(status=Prehab.ONGOING, change_seq=F('change_seq') + 1)
+        }
+
+    @staticmethod
+    def _update_task_dates(first_prehab_id, last_prehab_id, prehab_ids):
+        if connection.vendor not in CronHelper.TASK_DATE_SQL:
+            return CronHelper._update_task_dates_by_prehab(prehab_ids)
+
+        with connection.cursor() as cursor:
+            cursor.execute(CronHelper.TASK_DATE_SQL[connection.vendor],
+                           [connection.ops.adapt_datetimefield_value(timezone.now()),
+                            Prehab.COMPLETED, first_prehab_id, last_prehab_id])
+            return cursor.rowcount
+
+    @staticmethod
+    def _update_task_dates_by_prehab(prehab_ids):
+        """ Same as TASK_DATE_SQL with the ORM: one update per prehab, choosing the date by week and day number """
+        dates_updated = 0
+        now = timezone.now()
+        prehabs = Prehab.objects.filter(id__in=prehab_ids, status__lt=Prehab.COMPLETED)
+        for prehab_id, init_date, change_seq in prehabs.values_list('id', 'init_date', 'change_seq'):
+            tasks = PatientTaskSchedule.objects.filter(prehab_id=prehab_id, date__isnull=True)
+            days = list(tasks.order_by().values_list('week_number', 'day_number').distinct())
+            if len(days) == 0:
+                continue
+
+            dates_updated += tasks.update(date=Case(*[
+                When(week_number=week_number, day_number=day_number, then=Value(CronHelper._start_of_day(
+                    init_date + datetime.timedelta(days=7 * (week_number - 1) + day_number - 1))))
+                for week_number, day_number in days
+            ], output_field=DateTimeField()), updated_at=now, change_seq=change_seq)
+
+        return dates_updated
+
+    @staticmethod
+    def _start_of_day(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), timezone.utc)
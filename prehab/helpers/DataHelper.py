@@ -1,30 +1,32 @@
 import math
 import random
-from functools import reduce
-
-from django.db.models import Count
+from itertools import groupby
 
 from prehab.helpers.HttpException import HttpException
+from prehab.helpers.MealIndex import MealIndex
 from prehab_app.models import WeekTaskSchedule
 from prehab_app.models.Meal import Meal
-from prehab_app.models.MealConstraintType import MealConstraintType
 
 
 class DataHelper:
     @staticmethod
     def patient_task_schedule_work_load(task_schedule):
-        patient_task_schedule_work_load = []  # Each must have: week_number, day_number, meal_id
-        week_task_schedule = WeekTaskSchedule.objects.filter(task_schedule=task_schedule)
-
-        # Generate for each week
-        for week_number in range(1, task_schedule.number_of_weeks + 1):
+        """
+        Yield the rows of a task schedule template (week_number, day_number, task, expected_repetitions), week by
+        week and day by day. The whole template is read with a single query.
+        """
+        tasks_in_schedule = WeekTaskSchedule.objects.filter(task_schedule=task_schedule) \
+            .filter(week_number__gte=1, week_number__lte=task_schedule.number_of_weeks) \
+            .select_related('task').order_by('week_number', '-id')
+
+        for week_number, tasks_for_week in groupby(tasks_in_schedule, key=lambda t: t.week_number):
             week = [[], [], [], [], [], [], []]
+            tasks_per_day = [0] * 7
 
-            tasks_for_week = week_task_schedule.filter(week_number=week_number).all()  # get tasks per week
             # Equitively distribute tasks through the week
             for task_in_week in tasks_for_week:
                 # Get Best Indexes
-                indexes = DataHelper._best_indexes_to_put_tasks(week, task_in_week.times_per_week)
+                indexes = DataHelper._best_indexes_to_put_tasks(tasks_per_day, task_in_week.times_per_week)
                 for idx in indexes:
                     week[idx].append({
                         "week_number": week_number,
@@ -32,60 +34,47 @@ class DataHelper:
                         "task": task_in_week.task,
                         "expected_repetitions": task_in_week.repetition_number
                     })
-            patient_task_schedule_work_load = patient_task_schedule_work_load + reduce(lambda x, y: x + y, week)
+                    tasks_per_day[idx] += 1
 
-        return patient_task_schedule_work_load
+            for day in week:
+                yield from day
 
     @staticmethod
-    def patient_meal_schedule(number_of_weeks, constraint_types):
-        patient_meal_schedule = []  # Each must have: week_number, day_number, meal_order, meal_id
-        available_meals = DataHelper._get_available_meals(constraint_types)
-
-        breakfasts = available_meals.filter(meal_type=1).all()
-        snacks = available_meals.filter(meal_type=2).all()
-        full_meals = available_meals.filter(meal_type=3).all()
+    def patient_meal_schedule(number_of_weeks, constraint_type_ids, seed=None):
+        """
+        Yield (week_number, day_number, meal_order, meal_id) for every meal of the plan: per day a breakfast, a snack,
+        a full meal, a snack and a full meal. A seed makes the plan reproducible.
+        """
+        available_meals = DataHelper.available_meals(constraint_type_ids)
+        rng = random.Random(seed)
+
+        breakfasts = DataHelper._draw_meals(rng, available_meals[Meal.BREAKFAST], number_of_weeks, 7)
+        snacks = DataHelper._draw_meals(rng, available_meals[Meal.SNACK], number_of_weeks, 14)
+        full_meals = DataHelper._draw_meals(rng, available_meals[Meal.FULL_MEAL], number_of_weeks, 14)
 
         # Generate for each week
-        for week_number in range(1, number_of_weeks + 1):
-            breakfast_for_week = DataHelper._get_meals(breakfasts, 7)
-            snacks_for_week = DataHelper._get_meals(snacks, 14)
-            full_meals_for_week = DataHelper._get_meals(full_meals, 14)
+        for week_number, breakfast_for_week, snacks_for_week, full_meals_for_week in \
+                zip(range(1, number_of_weeks + 1), breakfasts, snacks, full_meals):
             for day_number in range(7):
-                patient_meal_schedule.append({
-                    "week_number": week_number,
-                    "day_number": day_number + 1,
-                    "meal_order": 1,
-                    "meal": breakfast_for_week[day_number]
-                })
-                patient_meal_schedule.append({
-                    "week_number": week_number,
-                    "day_number": day_number + 1,
-                    "meal_order": 2,
-                    "meal": snacks_for_week[day_number * 2]
-                })
-                patient_meal_schedule.append({
-                    "week_number": week_number,
-                    "day_number": day_number + 1,
-                    "meal_order": 3,
-                    "meal": full_meals_for_week[day_number * 2]
-                })
-                patient_meal_schedule.append({
-                    "week_number": week_number,
-                    "day_number": day_number + 1,
-                    "meal_order": 4,
-                    "meal": snacks_for_week[day_number * 2 + 1]
-                })
-                patient_meal_schedule.append({
-                    "week_number": week_number,
-                    "day_number": day_number + 1,
-                    "meal_order": 5,
-                    "meal": full_meals_for_week[day_number * 2 + 1]
-                })
-
-        return patient_meal_schedule
+                yield week_number, day_number + 1, 1, breakfast_for_week[day_number]
+                yield week_number, day_number + 1, 2, snacks_for_week[day_number * 2]
+                yield week_number, day_number + 1, 3, full_meals_for_week[day_number * 2]
+                yield week_number, day_number + 1, 4, snacks_for_week[day_number * 2 + 1]
+                yield week_number, day_number + 1, 5, full_meals_for_week[day_number * 2 + 1]
+
+    @staticmethod
+    def available_meals(constraint_type_ids):
+        """ Meal ids by meal type for these constraints. Raises HttpException if a meal type has none. """
+        available_meals = MealIndex.available(constraint_type_ids)
+        for meal_type in (Meal.BREAKFAST, Meal.SNACK, Meal.FULL_MEAL):
+            if len(available_meals[meal_type]) == 0:
+                raise HttpException(401, 'Não existem refeições para este tipo de paciente.',
+                                    'Number of meals for this type of patient is zero.')
+
+        return available_meals
 
     @staticmethod
-    def _best_indexes_to_put_tasks(week, times):
+    def _best_indexes_to_put_tasks(tasks_per_day, times):
         indexes = []
         rate = 7 / times
 
@@ -93,8 +82,8 @@ class DataHelper:
             return indexes
 
         index_with_min_tasks = 0
-        for index, task_list in enumerate(week):
-            if len(week[index_with_min_tasks]) > len(task_list):
+        for index, number_of_tasks in enumerate(tasks_per_day):
+            if tasks_per_day[index_with_min_tasks] > number_of_tasks:
                 index_with_min_tasks = index
 
         # Put the first Task in the best position
@@ -110,37 +99,27 @@ class DataHelper:
             floor = math.floor(next_index) % 7
             ceil = math.ceil(next_index) % 7
 
-            next_index = floor if len(week[floor]) <= len(week[ceil]) else ceil
+            next_index = floor if tasks_per_day[floor] <= tasks_per_day[ceil] else ceil
             indexes.append(next_index)
             times = times - 1
 
         return indexes
 
     @staticmethod
-    def _get_available_meals(constraint_types):
-        if len(constraint_types) == 0:
-            available_meals = Meal.objects
-        else:
-            ids = []
-            tmp = {}
-            tmp_available_meals = MealConstraintType.objects.values('meal_id').annotate(total=Count('meal')).all()
-            for available_meal in tmp_available_meals:
-                if available_meal['meal_id'] not in tmp:
-                    tmp[available_meal['meal_id']] = 0
-                tmp[available_meal['meal_id']] = tmp[available_meal['meal_id']] + available_meal['total']
-                if tmp[available_meal['meal_id']] == len(constraint_types):
-                    ids.append(available_meal['meal_id'])
-            available_meals = Meal.objects.filter(id__in=ids)
-
-        return available_meals
-
-    @staticmethod
-    def _get_meals(meals, times):
-        meals_bulk = []
-        if len(meals) == 0:
-            raise HttpException(401, 'Não existem refeições para este tipo de paciente.', 'Number of meals for this type of patient is zero.')
-
-        for i in range(math.ceil(times / len(meals))):
-            meals_bulk = meals_bulk + list(meals)
-
-        return random.sample(meals_bulk, times)
+    def _draw_meals(rng, meal_ids, number_of_weeks, times):
+        """
+        `times` meals per week for every week of the plan, drawn without replacement from the meals repeated enough
+        times, with a single shuffle of all the weeks' slots: the order each week gets from a shuffle of the whole
+        plan is an independent random order of its own slots, so every week is a uniform sample of its pool.
+        """
+        pool = list(meal_ids) * math.ceil(times / len(meal_ids))
+        slots = list(range(number_of_weeks * len(pool)))
+        rng.shuffle(slots)
+
+        weeks = [[] for _ in range(number_of_weeks)]
+        for slot in slots:
+            week, index = divmod(slot, len(pool))
+            if len(weeks[week]) < times:
+                weeks[week].append(pool[index])
+
+        return weeks
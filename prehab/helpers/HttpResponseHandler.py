@@ -1,10 +1,39 @@
-from django.http import JsonResponse
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 
 class HTTP:
+    # Rows fetched and serialized at a time by stream
+    STREAM_CHUNK_SIZE = 500
+
+    @staticmethod
+    def response(http_code, custom_message='', details="", data=None, paginator=None, etag=None, last_modified=None):
+        res = {
+            **HTTP._envelope(http_code, custom_message, details, paginator),
+            "data": data if data is not None else dict()
+        }
+
+        return HTTP._set_version_headers(JsonResponse(res, status=res['code']), etag, last_modified)
+
+    @staticmethod
+    def stream(http_code, queryset, serializer_class, custom_message='', details="", paginator=None, etag=None,
+               last_modified=None):
+        """
+        Same envelope as response, but `data` is encoded from the queryset rows while they are fetched, in chunks of
+        STREAM_CHUNK_SIZE, so memory doesn't grow with the number of rows.
+        """
+        envelope = json.dumps(HTTP._envelope(http_code, custom_message, details, paginator), cls=DjangoJSONEncoder)
+        res = StreamingHttpResponse(HTTP._stream_data(envelope, queryset, serializer_class),
+                                    status=http_code, content_type='application/json')
+
+        return HTTP._set_version_headers(res, etag, last_modified)
 
     @staticmethod
-    def response(http_code, custom_message='', details="", data=None, paginator=None):
+    def _envelope(http_code, custom_message, details, paginator):
         message = ''
 
         if http_code == 200:
@@ -32,21 +61,65 @@ class HTTP:
         if http_code == 501:
             message = "Not Implemented"
 
-        pagination_info = {
-            'count': paginator.page.paginator.count,
-            'total_pages': paginator.page.paginator.num_pages,
-            'page': paginator.page.number,
-            'next': paginator.get_next_link(),
-            'previous': paginator.get_previous_link(),
-        } if paginator is not None else {}
+        if paginator is None:
+            pagination_info = {}
+        elif hasattr(paginator, 'pagination_info'):
+            pagination_info = paginator.pagination_info()
+        else:
+            pagination_info = {
+                'count': paginator.page.paginator.count,
+                'total_pages': paginator.page.paginator.num_pages,
+                'page': paginator.page.number,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+            }
 
-        res = {
+        return {
             "code": http_code,
             "message": message,
             "details": details,
-            "custom_message":custom_message,
-            **pagination_info,
-            "data": data if data is not None else dict()
+            "custom_message": custom_message,
+            **pagination_info
         }
 
-        return JsonResponse(res, status=res['code'])
+    @staticmethod
+    def _stream_data(envelope, queryset, serializer_class):
+        # The envelope without its closing brace, then the rows
+        yield envelope[:-1] + ', "data": ['
+
+        separator = ''
+        chunk = []
+        for row in queryset.iterator(chunk_size=HTTP.STREAM_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == HTTP.STREAM_CHUNK_SIZE:
+                yield separator + HTTP._encode_rows(chunk, serializer_class)
+                separator = ', '
+                chunk = []
+        if len(chunk) > 0:
+            yield separator + HTTP._encode_rows(chunk, serializer_class)
+
+        yield ']}'
+
+    @staticmethod
+    def _encode_rows(rows, serializer_class):
+        return ', '.join(json.dumps(record, cls=DjangoJSONEncoder) for record in serializer_class(rows, many=True).data)
+
+    @staticmethod
+    def not_modified(request, etag=None, last_modified=None):
+        """
+        304 response when the client has this version already (If-None-Match), None otherwise.
+        Check it before serializing anything. If-Modified-Since is ignored: dates have a one second resolution and
+        don't change when rows are deleted, so only the ETag tells versions apart. `last_modified` is only sent back.
+        """
+        res = get_conditional_response(request, etag=quote_etag(etag) if etag is not None else None)
+
+        return HTTP._set_version_headers(res, etag, last_modified) if res is not None else None
+
+    @staticmethod
+    def _set_version_headers(res, etag, last_modified):
+        if etag is not None:
+            res['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            res['Last-Modified'] = http_date(last_modified.timestamp())
+
+        return res
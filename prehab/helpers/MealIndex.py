@@ -0,0 +1,74 @@
+from types import MappingProxyType
+
+from django.db.models import Count, Max
+
+from prehab_app.models.Meal import Meal
+from prehab_app.models.MealConstraintType import MealConstraintType
+
+
+class MealIndex:
+    """
+    Process-local eligibility index of the meals. Each meal keeps a bitset of the constraint types it fits
+    (bit n set for constraint type n), so a meal suits a patient when it has every bit of the patient's constraints.
+    Answers are cached per distinct set of constraints. The index is rebuilt when invalidated by this process, or
+    when the meal table changed (new meals added by any process), checked with one aggregate query per lookup.
+    """
+    # (meal_id, meal_type, bitset)
+    _meals = None
+    # (number of meals, last meal id) the index was built from
+    _version = None
+    # frozenset(constraint_type_ids) -> {meal_type: (meal_id, ...)}
+    _by_constraints = {}
+
+    @staticmethod
+    def available(constraint_type_ids):
+        """ Ids of the meals that fit all the constraint types, grouped by meal type. """
+        version = Meal.objects.aggregate(count=Count('id'), last_id=Max('id'))
+        version = (version['count'], version['last_id'])
+        if version != MealIndex._version:
+            MealIndex.invalidate()
+            MealIndex._version = version
+
+        key = frozenset(constraint_type_ids)
+        available_meals = MealIndex._by_constraints.get(key)
+        if available_meals is not None:
+            return available_meals
+
+        required = MealIndex.bitset(key)
+        grouped = {meal_type: [] for meal_type, _ in Meal.meal_types}
+        for meal_id, meal_type, bitset in MealIndex._load():
+            if bitset & required == required:
+                grouped.setdefault(meal_type, []).append(meal_id)
+
+        available_meals = MappingProxyType({meal_type: tuple(ids) for meal_type, ids in grouped.items()})
+        MealIndex._by_constraints[key] = available_meals
+
+        return available_meals
+
+    @staticmethod
+    def bitset(constraint_type_ids):
+        bitset = 0
+        for constraint_type_id in constraint_type_ids:
+            bitset |= 1 << constraint_type_id
+
+        return bitset
+
+    @staticmethod
+    def _load():
+        if MealIndex._meals is None:
+            bitsets = {}
+            for meal_id, constraint_type_id in MealConstraintType.objects.values_list('meal_id', 'constraint_type_id'):
+                bitsets[meal_id] = bitsets.get(meal_id, 0) | 1 << constraint_type_id
+
+            MealIndex._meals = tuple(
+                (meal_id, meal_type, bitsets.get(meal_id, 0))
+                for meal_id, meal_type in Meal.objects.order_by('id').values_list('id', 'meal_type')
+            )
+
+        return MealIndex._meals
+
+    @staticmethod
+    def invalidate():
+        MealIndex._meals = None
+        MealIndex._version = None
+        MealIndex._by_constraints = {}
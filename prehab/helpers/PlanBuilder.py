@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.utils import timezone
+
+from prehab.helpers.BulkWriter import BulkWriter
+from prehab.helpers.DataHelper import DataHelper
+from prehab_app.models.PatientConstraintType import PatientConstraintType
+from prehab_app.models.PatientMealSchedule import PatientMealSchedule
+from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
+from prehab_app.models.PlanJob import PlanJob
+from prehab_app.models.Prehab import Prehab
+from prehab_app.models.PrehabStatistics import PrehabStatistics
+
+
+class PlanBuilder:
+    """
+    Writes the tasks and meals of a new prehab, either inside the request that creates it or later, from the
+    queued plan jobs (see the run_plan_jobs command).
+    """
+
+    @staticmethod
+    def materialize(prehab, task_schedule):
+        """
+        Insert the patient tasks, statistics and patient meals of the prehab. Returns the number of tasks.
+        The statistics row is rebuilt, as a request may have created an empty one while the plan job was queued, and
+        Prehab.change_seq is incremented, so the plans cached before by any process are not served anymore.
+        The prehab row is locked and a prehab that has tasks already is left as it is: a job claimed again after
+        PLAN_JOB_TIMEOUT while its first worker is only slow doesn't write the plan twice.
+        """
+        with transaction.atomic():
+            # 0. Skip the plans written already
+            list(Prehab.objects.select_for_update().filter(pk=prehab.id).values_list('id', flat=True))
+            existing_tasks = PatientTaskSchedule.objects.filter(prehab_id=prehab.id).count()
+            if existing_tasks > 0:
+                return existing_tasks
+
+            # 1. Insert Patient Task Schedule
+            patient_task_schedule_work_load = DataHelper.patient_task_schedule_work_load(task_schedule)
+            number_of_tasks = BulkWriter.insert(PatientTaskSchedule, (PatientTaskSchedule(
+                prehab=prehab,
+                week_number=row['week_number'],
+                day_number=row['day_number'],
+                task=row['task'],
+                expected_repetitions=1,  # row['repetitions'],
+                actual_repetitions=None,
+                status=PatientTaskSchedule.PENDING
+            ) for row in patient_task_schedule_work_load))
+            PrehabStatistics.objects.rebuild([prehab.id])
+
+            # 2. Insert Patient Meal Schedule
+            constraint_type_ids = PatientConstraintType.objects.filter(patient_id=prehab.patient_id) \
+                .values_list('constraint_type_id', flat=True)
+            patient_meal_schedule = DataHelper.patient_meal_schedule(task_schedule.number_of_weeks,
+                                                                     constraint_type_ids, prehab.meal_seed)
+            BulkWriter.insert(PatientMealSchedule, (PatientMealSchedule(
+                prehab=prehab,
+                week_number=week_number,
+                day_number=day_number,
+                meal_order=meal_order,
+                meal_id=meal_id
+            ) for week_number, day_number, meal_order, meal_id in patient_meal_schedule))
+
+            Prehab.objects.filter(pk=prehab.id).next_change_seq()
+
+        return number_of_tasks
+
+    @staticmethod
+    def run_job(job):
+        """ Materialize the prehab of a claimed job and record the outcome in the job. """
+        try:
+            with transaction.atomic():
+                PlanBuilder.materialize(job.prehab, job.task_schedule)
+                job.status = PlanJob.DONE
+                job.error = None
+                job.finished_at = timezone.now()
+                job.save()
+        except Exception as e:
+            job.status = PlanJob.FAILED
+            job.error = '{}: {}'.format(type(e).__name__, getattr(e, 'http_detail', str(e)))[:512]
+            job.finished_at = timezone.now()
+            job.save()
+
+        return job
+
+    @staticmethod
+    def run_pending(limit=None):
+        """ Run queued jobs until there are none left (or `limit` were run). Returns how many finished per status. """
+        result = {'done': 0, 'failed': 0}
+        while limit is None or result['done'] + result['failed'] < limit:
+            job = PlanJob.objects.claim()
+            if job is None:
+                break
+
+            job = PlanBuilder.run_job(job)
+            result['done' if job.status == PlanJob.DONE else 'failed'] += 1
+
+        return result
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from prehab.helpers.RowVersion import RowVersion
+from prehab_app.models.Prehab import Prehab
+
+
+class PrehabCache:
+    """
+    Cache of the full prehab plan (PrehabViewSet.retrieve payload).
+    Entries are keyed by prehab id and by the version of the prehab row: Prehab.change_seq, which is incremented in the
+    database by every change to the prehab, its tasks or its meals, and the counters of its statistics row, which are
+    updated right after the tasks. The version is read from the database, so changes made by other web workers or by
+    the cron commands are seen by every process, whatever the cache backend.
+    A new version makes the old entries unreachable, so nothing has to be deleted and an entry built while the prehab
+    changes is never served. The patient and doctors are not part of the entries, as their changes don't touch the
+    prehab version: retrieve loads them on every request.
+    """
+    DATA_KEY = 'prehab:data:{}'
+    STATISTICS = ('total', 'done', 'not_done', 'with_difficulty', 'alerts', 'alerts_unseen')
+
+    @staticmethod
+    def version(prehab_id):
+        """ Current version of the prehab, by one query. Raises Prehab.DoesNotExist. """
+        return Prehab.objects.values_list(
+            'change_seq', *['statistics__' + counter for counter in PrehabCache.STATISTICS]
+        ).get(pk=prehab_id)
+
+    @staticmethod
+    def version_of(prehab, statistics):
+        """ Version of a prehab and statistics row already loaded """
+        return (prehab.change_seq, *[getattr(statistics, counter) for counter in PrehabCache.STATISTICS])
+
+    @staticmethod
+    def etag(prehab_id, version):
+        """ Strong ETag of the plan at this version. It is also the key of its cache entry. """
+        return 'prehab-{}-{}-{}'.format(prehab_id, version[0], RowVersion.digest(list(version[1:])))
+
+    @staticmethod
+    def get(etag):
+        return PrehabCache._cache().get(PrehabCache.DATA_KEY.format(etag))
+
+    @staticmethod
+    def set(etag, data):
+        PrehabCache._cache().set(PrehabCache.DATA_KEY.format(etag), data)
+
+    @staticmethod
+    def bump(*prehab_ids):
+        """ New version of the prehabs, for changes that don't go through their tasks or meals """
+        Prehab.objects.filter(id__in=prehab_ids).next_change_seq()
+
+    @staticmethod
+    def clear():
+        PrehabCache._cache().clear()
+
+    @staticmethod
+    def _cache():
+        return caches[settings.PREHAB_CACHE]
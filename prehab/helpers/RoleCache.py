@@ -0,0 +1,25 @@
+from types import MappingProxyType
+
+from prehab_app.models.Role import Role
+
+
+class RoleCache:
+    """
+    Process-local, read-only table of the roles (title -> id). It is read from the database on first use and
+    reset whenever a role is saved or deleted (see prehab_app.signals).
+    """
+    _ids = None
+
+    @staticmethod
+    def ids(titles):
+        """ Ids of the roles with these titles """
+        role_ids = RoleCache._ids
+        if role_ids is None:
+            role_ids = MappingProxyType({title: role_id for role_id, title in Role.objects.values_list('id', 'title')})
+            RoleCache._ids = role_ids
+
+        return frozenset(role_ids[title] for title in titles if title in role_ids)
+
+    @staticmethod
+    def invalidate():
+        RoleCache._ids = None
@@ -0,0 +1,32 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+
+class RowVersion:
+    """
+    ETags and Last-Modified dates of rows with an `updated_at` version (see HTTP.not_modified). Only the ETags are
+    used to answer 304.
+    """
+
+    @staticmethod
+    def of_row(name, row):
+        """ (etag, last_modified) of a single row """
+        return '{}-{}-{}'.format(name, row.pk, int(row.updated_at.timestamp() * 1000000)), row.updated_at
+
+    @staticmethod
+    def of_queryset(name, queryset, *keys):
+        """
+        (etag, last_modified) of the rows of a queryset, by one aggregate query: the count catches deleted rows and
+        the latest updated_at any new or changed one. `keys` tell apart the responses built from the same rows
+        (user, query string...).
+        """
+        version = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        last_modified = version['last_modified']
+        key = [version['count'], last_modified.timestamp() if last_modified else None, *keys]
+
+        return '{}-{}'.format(name, RowVersion.digest(key)), last_modified
+
+    @staticmethod
+    def digest(values):
+        return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
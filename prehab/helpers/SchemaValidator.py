@@ -1,18 +1,68 @@
 import json
+import os
 
 import jsonschema
+from django.conf import settings
 
 from prehab.helpers.HttpException import HttpException
 
+SCHEMA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'prehab_app', 'schemas'
+)
+
 
 class SchemaValidator:
+    """
+    Every schema under prehab_app/schemas is compiled once into a validator (see load, called when the app is
+    ready), so validating a request does no file I/O. With DEBUG on, a schema file is recompiled when it changes.
+    """
+    # file_path -> (mtime, validator)
+    _validators = {}
+
+    @staticmethod
+    def load():
+        validators = {}
+        for root, _, files in os.walk(SCHEMA_DIR):
+            for file_name in files:
+                if file_name.endswith('.json'):
+                    file_path = os.path.relpath(os.path.join(root, file_name), SCHEMA_DIR).replace(os.sep, '/')
+                    validators[file_path] = SchemaValidator._compile(file_path)
+
+        SchemaValidator._validators = validators
+
+    @staticmethod
+    def _compile(file_path):
+        full_path = os.path.join(SCHEMA_DIR, file_path)
+        mtime = os.path.getmtime(full_path)
+        with open(full_path, encoding='utf-8') as data_file:
+            schema = json.loads(data_file.read())
+
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+
+        return mtime, validator_class(schema)
+
+    @staticmethod
+    def get_validator(file_path):
+        compiled = SchemaValidator._validators.get(file_path)
+        if settings.DEBUG:
+            full_path = os.path.join(SCHEMA_DIR, file_path)
+            if compiled is None or not os.path.isfile(full_path) or os.path.getmtime(full_path) != compiled[0]:
+                compiled = None
+                SchemaValidator._validators.pop(file_path, None)
+                if os.path.isfile(full_path):
+                    compiled = SchemaValidator._compile(file_path)
+                    SchemaValidator._validators[file_path] = compiled
+
+        if compiled is None:
+            raise FileNotFoundError(2, 'No such file', 'prehab_app/schemas/' + file_path)
+
+        return compiled[1]
 
     @staticmethod
     def validate_obj_structure(req_json, file_path):
         try:
-            with open('prehab_app/schemas/' + file_path, encoding='utf-8') as data_file:
-                schema = json.loads(data_file.read())
-            jsonschema.validate(req_json, schema)
+            SchemaValidator.get_validator(file_path).validate(req_json)
 
         except jsonschema.SchemaError as e:
             raise HttpException(400, 'Erro de Validação de dados.', e.message)
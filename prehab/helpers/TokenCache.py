@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import jwt
+from django.conf import settings
+
+Identity = namedtuple('Identity', ('user_id', 'role_id', 'is_admin', 'is_doctor', 'is_patient'))
+
+
+class TokenCache:
+    """
+    Bounded LRU cache (JWT_CACHE_SIZE entries) of verified JWTs and the identity they carry, so a token is decoded and
+    verified once per process. Entries last JWT_CACHE_TIMEOUT seconds at most and never outlive the token `exp`.
+    """
+    _tokens = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def identity(token):
+        """ Identity of a valid token. Raises jwt.InvalidTokenError for invalid or expired ones. """
+        now = time.time()
+        with TokenCache._lock:
+            entry = TokenCache._tokens.get(token)
+            if entry is not None:
+                identity, expires_at = entry
+                if expires_at > now:
+                    TokenCache._tokens.move_to_end(token)
+                    return identity
+                del TokenCache._tokens[token]
+
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        try:
+            identity = Identity(user_id=payload['user_id'],
+                                role_id=payload['role_id'],
+                                is_admin=payload['role_id'] == 1,
+                                is_doctor=payload['role_id'] == 2,
+                                is_patient=payload['role_id'] == 3)
+        except (KeyError, TypeError):
+            raise jwt.InvalidTokenError('Token without identity.')
+        expires_at = min(now + settings.JWT_CACHE_TIMEOUT, payload.get('exp', float('inf')))
+
+        with TokenCache._lock:
+            TokenCache._tokens[token] = (identity, expires_at)
+            TokenCache._tokens.move_to_end(token)
+            while len(TokenCache._tokens) > settings.JWT_CACHE_SIZE:
+                TokenCache._tokens.popitem(last=False)
+
+        return identity
+
+    @staticmethod
+    def clear():
+        with TokenCache._lock:
+            TokenCache._tokens.clear()
@@ -1,8 +1,7 @@
-import jwt
-from jwt import DecodeError
+from jwt import InvalidTokenError
 
 from prehab.helpers.HttpResponseHandler import HTTP
-from django.conf import settings
+from prehab.helpers.TokenCache import TokenCache
 
 
 class PrehabGlobalMiddleware(object):
@@ -26,12 +25,12 @@ class PrehabGlobalMiddleware(object):
                 return HTTP.response(401, 'Falta o token nos headers.', 'Token not present')
 
             try:
-                jwt_encoded = request.META['HTTP_JWT']
-                jwt_decoded = jwt.decode(jwt_encoded, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
-            except DecodeError:
+                identity = TokenCache.identity(request.META['HTTP_JWT'])
+            except InvalidTokenError:
                 return HTTP.response(401, 'Token não é válido.', 'Token not valid.')
 
-            request.USER_ID = jwt_decoded['user_id']
-            request.ROLE_ID = jwt_decoded['role_id']
+            request.IDENTITY = identity
+            request.USER_ID = identity.user_id
+            request.ROLE_ID = identity.role_id
 
         return self.get_response(request)
@@ -0,0 +1,169 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that doesn't COUNT(*) large tables. Whole tables with at least APPROXIMATE_COUNT_THRESHOLD rows are
+    counted with PostgreSQL's planner estimate (pg_class.reltuples) or, on other databases, with an exact count
+    cached for APPROXIMATE_COUNT_TIMEOUT seconds. Filtered and small sets are counted exactly.
+    With an approximate count, pages past the estimate can still be read.
+    """
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        if self._is_whole_table():
+            estimate = self._estimate()
+            if estimate is not None and estimate >= settings.APPROXIMATE_COUNT_THRESHOLD:
+                self.count_is_approximate = True
+                return estimate
+
+        try:
+            count = self.object_list.count()
+        except (AttributeError, TypeError):
+            # Lists
+            count = len(self.object_list)
+
+        if self._is_whole_table() and count >= settings.APPROXIMATE_COUNT_THRESHOLD:
+            caches['default'].set(self._cache_key(), count, settings.APPROXIMATE_COUNT_TIMEOUT)
+
+        return count
+
+    def validate_number(self, number):
+        # The count tells if it is approximate
+        self.count
+        if not self.count_is_approximate:
+            return super(ApproximateCountPaginator, self).validate_number(number)
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super(ApproximateCountPaginator, self).page(number)
+
+        # Read one row ahead to know if there's a next page
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if len(object_list) == 0 and number > 1:
+            raise EmptyPage('That page contains no results')
+
+        return ApproximateCountPage(object_list[:self.per_page], number, self, len(object_list) > self.per_page)
+
+    def _is_whole_table(self):
+        return isinstance(self.object_list, QuerySet) \
+               and not self.object_list.query.where \
+               and not self.object_list.query.distinct \
+               and self.object_list.query.low_mark == 0 and self.object_list.query.high_mark is None
+
+    def _estimate(self):
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return caches['default'].get(self._cache_key())
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                           [self.object_list.model._meta.db_table])
+            row = cursor.fetchone()
+
+        # Tables never analyzed have no estimate
+        return int(row[0]) if row is not None and row[0] > 0 else None
+
+    def _cache_key(self):
+        return 'approximate_count:{}'.format(self.object_list.model._meta.db_table)
+
+
+class ApproximateCountPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super(ApproximateCountPage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class PageSizePagination(PageNumberPagination):
+    """
+    Default pagination: page numbers, with a `page_size` parameter up to max_page_size (larger ones are capped).
+    """
+    django_paginator_class = ApproximateCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def pagination_info(self):
+        """ Pagination fields of the response envelope (see HTTP.response) """
+        return {
+            'count': self.page.paginator.count,
+            'count_is_approximate': self.page.paginator.count_is_approximate,
+            'total_pages': self.page.paginator.num_pages,
+            'page': self.page.number,
+            'page_size': self.page.paginator.per_page,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, newest first (the default ordering of the models). Pages are read with
+    `pk < cursor ORDER BY pk DESC LIMIT n`, so a deep page costs the same as the first one - and there's no COUNT.
+    """
+    ordering = '-pk'
+    page_size_query_param = PageSizePagination.page_size_query_param
+    max_page_size = PageSizePagination.max_page_size
+
+    def pagination_info(self):
+        next_link = self.get_next_link()
+        previous_link = self.get_previous_link()
+
+        return {
+            'next': next_link,
+            'previous': previous_link,
+            'next_cursor': self._cursor_of(next_link),
+            'previous_cursor': self._cursor_of(previous_link)
+        }
+
+    def _cursor_of(self, link):
+        return parse_qs(urlparse(link).query)[self.cursor_query_param][0] if link is not None else None
+
+
+class PageOrCursorPagination(BasePagination):
+    """
+    Page numbers by default. Requests with a `cursor` parameter (empty for the first page) get keyset pages instead,
+    see IdCursorPagination.
+    """
+    cursor_query_param = IdCursorPagination.cursor_query_param
+
+    def __init__(self):
+        self.page_number_pagination = PageSizePagination()
+        self.cursor_pagination = IdCursorPagination()
+        self.pagination = self.page_number_pagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.pagination = self.cursor_pagination
+        else:
+            self.pagination = self.page_number_pagination
+
+        return self.pagination.paginate_queryset(queryset, request, view)
+
+    def pagination_info(self):
+        return self.pagination.pagination_info()
+
+    def get_paginated_response(self, data):
+        return self.pagination.get_paginated_response(data)
@@ -1,7 +1,7 @@
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
 
-from prehab.settings.base import PERMISSIONS
-from prehab_app.models.Role import Role
+from prehab.helpers.RoleCache import RoleCache
 
 
 class AllowOptionsAuthentication(IsAuthenticated):
@@ -16,9 +16,7 @@ class AllowOptionsAuthentication(IsAuthenticated):
 class Permission:
     @staticmethod
     def verify(request, allowed):
-        if not PERMISSIONS:
+        if not settings.PERMISSIONS:
             return True
 
-        role_title = Role.objects.which_role(request.ROLE_ID)
-
-        return role_title in allowed
+        return request.ROLE_ID in RoleCache.ids(allowed)
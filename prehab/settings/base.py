@@ -30,7 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'rest_framework',
-    'prehab_app'
+    'prehab_app.apps.PrehabAppConfig'
 ]
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
@@ -122,11 +122,40 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'prehab.permissions.AllowOptionsAuthentication',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'prehab.pagination.PageSizePagination',
     'PAGE_SIZE': 100
 }
 
+# Whole tables with at least this many rows get an approximate count in paginated lists (see prehab.pagination)
+APPROXIMATE_COUNT_THRESHOLD = 10000
+# Seconds an exact count is reused as the approximate one, on databases without planner estimates
+APPROXIMATE_COUNT_TIMEOUT = 60 * 5
+
 FIXTURE_DIRS = (os.path.join(BASE_DIR, 'fixtures'),)
 
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# Local memory caches are per process - use a shared backend (memcached, redis, database) with several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'prehab': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'prehab',
+        'TIMEOUT': 60 * 60 * 24,
+    }
+}
+# Cache used for the full prehab plans (see prehab.helpers.PrehabCache)
+PREHAB_CACHE = 'prehab'
+
+# Rows per COPY / INSERT statement when materializing prehab plans (see prehab.helpers.BulkWriter)
+BULK_WRITER_BATCH_SIZE = 5000
+# Seconds after which a plan job left running by a dead worker is run again (see prehab_app.models.PlanJob)
+PLAN_JOB_TIMEOUT = 60 * 10
+
 JWT_ALGORITHM = 'HS256'
+# Verified tokens kept per process (see prehab.helpers.TokenCache) and for how many seconds at most
+JWT_CACHE_SIZE = 1024
+JWT_CACHE_TIMEOUT = 60 * 5
 PERMISSIONS = False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PrehabAppConfig(AppConfig):
     name = 'prehab_app'
     verbose_name = 'PreHab API'
+
+    def ready(self):
+        # Connect the signal receivers
+        from prehab_app import signals  # noqa: F401
+        from prehab.helpers.SchemaValidator import SchemaValidator
+
+        SchemaValidator.load()
@@ -0,0 +1,40 @@
+import argparse
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prehab.helpers.BatchProcessor import BatchProcessor
+
+
+class CronCommand(BaseCommand):
+    """ Base of the commands that run a CronHelper job out of the web workers. """
+    job = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BatchProcessor.DEFAULT_CHUNK_SIZE, help='Number of prehabs processed per transaction.')
+        parser.add_argument('--since', type=self.parse_date, default=None, help='Only look at changes since this day (dd-mm-yyyy).')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without saving it.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive number.')
+
+        result = self.job(since=options['since'],
+                          chunk_size=options['chunk_size'],
+                          dry_run=options['dry_run'],
+                          progress=self.progress)
+
+        prefix = '[DRY RUN] ' if options['dry_run'] else ''
+        summary = ', '.join('{}: {}'.format(key, value) for key, value in result.items())
+        self.stdout.write(self.style.SUCCESS('{}Done. {}'.format(prefix, summary)))
+
+    def progress(self, chunk_number, number_of_chunks, result):
+        summary = ', '.join('{}: {}'.format(key, value) for key, value in result.items())
+        self.stdout.write('Chunk {}/{} - {}'.format(chunk_number, number_of_chunks, summary))
+
+    @staticmethod
+    def parse_date(value):
+        try:
+            return datetime.datetime.strptime(value, '%d-%m-%Y').date()
+        except ValueError:
+            raise argparse.ArgumentTypeError('Invalid date {}. Use the dd-mm-yyyy format.'.format(value))
@@ -0,0 +1,70 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from prehab.helpers.BulkWriter import BulkWriter
+from prehab_app.models import Doctor, Meal, Patient, PatientMealSchedule, PatientTaskSchedule, Prehab, Task
+
+
+class Command(BaseCommand):
+    help = 'Compare bulk_create with BulkWriter when writing the tasks and meals of prehab plans. ' \
+           'Nothing is kept in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=12, help='Weeks of each plan.')
+        parser.add_argument('--plans', nargs='+', type=int, default=[1, 100], help='Number of plans written at once.')
+        parser.add_argument('--tasks-per-day', type=int, default=3)
+
+    def handle(self, *args, **options):
+        patient = Patient.objects.first()
+        doctor = Doctor.objects.first()
+        task = Task.objects.first()
+        meal = Meal.objects.first()
+        if None in (patient, doctor, task, meal):
+            raise CommandError('A patient, a doctor, a task and a meal are needed to build the plans.')
+
+        self.stdout.write('Database: {}'.format(connection.vendor))
+        for number_of_plans in options['plans']:
+            for writer_name, writer in (('bulk_create', self.bulk_create), ('BulkWriter', BulkWriter.insert)):
+                with transaction.atomic():
+                    init_date = datetime.date.today()
+                    Prehab.objects.bulk_create(Prehab(
+                        patient=patient, created_by=doctor, init_date=init_date, surgery_date=init_date,
+                        expected_end_date=init_date + datetime.timedelta(weeks=options['weeks']),
+                        number_of_weeks=options['weeks']
+                    ) for _ in range(number_of_plans))
+                    prehab_ids = list(Prehab.objects.order_by('-id').values_list('id', flat=True)[:number_of_plans])
+
+                    start = time.perf_counter()
+                    rows = writer(PatientTaskSchedule, self.tasks(prehab_ids, task, options))
+                    rows += writer(PatientMealSchedule, self.meals(prehab_ids, meal, options))
+                    elapsed = time.perf_counter() - start
+
+                    transaction.set_rollback(True)
+
+                self.stdout.write('{:>4} plans of {} weeks, {:<11}: {:>7} rows in {:8.1f} ms'.format(
+                    number_of_plans, options['weeks'], writer_name, rows, elapsed * 1000))
+
+    @staticmethod
+    def bulk_create(model, objs):
+        return len(model.objects.bulk_create(objs))
+
+    @staticmethod
+    def tasks(prehab_ids, task, options):
+        for prehab_id in prehab_ids:
+            for week_number in range(1, options['weeks'] + 1):
+                for day_number in range(1, 8):
+                    for _ in range(options['tasks_per_day']):
+                        yield PatientTaskSchedule(prehab_id=prehab_id, week_number=week_number,
+                                                  day_number=day_number, task=task, expected_repetitions=1)
+
+    @staticmethod
+    def meals(prehab_ids, meal, options):
+        for prehab_id in prehab_ids:
+            for week_number in range(1, options['weeks'] + 1):
+                for day_number in range(1, 8):
+                    for meal_order in range(1, 6):
+                        yield PatientMealSchedule(prehab_id=prehab_id, week_number=week_number,
+                                                  day_number=day_number, meal_order=meal_order, meal=meal)
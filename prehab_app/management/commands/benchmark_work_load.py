@@ -0,0 +1,45 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from prehab.helpers.DataHelper import DataHelper
+from prehab_app.models import Task, TaskSchedule, User, WeekTaskSchedule
+
+
+class Command(BaseCommand):
+    help = 'Time the expansion of task schedule templates into patient tasks. Nothing is kept in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', nargs='+', type=int, default=[4, 12, 52], help='Template lengths (weeks).')
+        parser.add_argument('--tasks-per-week', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        tasks = list(Task.objects.all()[:options['tasks_per_week']])
+        if not tasks:
+            self.stderr.write('There are no tasks to build the templates with.')
+            return
+
+        with transaction.atomic():
+            created_by = User.objects.filter(is_active=True).first()
+            for number_of_weeks in options['weeks']:
+                task_schedule = TaskSchedule.objects.create(title='Benchmark', number_of_weeks=number_of_weeks,
+                                                            created_by=created_by)
+                WeekTaskSchedule.objects.bulk_create(
+                    WeekTaskSchedule(task_schedule=task_schedule, week_number=week_number, task=task,
+                                     times_per_week=1 + (week_number + idx) % 7)
+                    for week_number in range(1, number_of_weeks + 1) for idx, task in enumerate(tasks)
+                )
+
+                queries = len(connection.queries)
+                rows = len(list(DataHelper.patient_task_schedule_work_load(task_schedule)))
+                queries = len(connection.queries) - queries
+                best = min(timeit.repeat(lambda: list(DataHelper.patient_task_schedule_work_load(task_schedule)),
+                                         number=1, repeat=options['repeat']))
+
+                self.stdout.write('{:>3} weeks: {:>5} rows, {:.2f} ms{}'.format(
+                    number_of_weeks, rows, best * 1000,
+                    ', {} queries'.format(queries) if connection.queries_logged else ''))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,7 @@
+from prehab.helpers.CronHelper import CronHelper
+from prehab_app.management.CronCommand import CronCommand
+
+
+class Command(CronCommand):
+    help = 'Start the prehabs whose init date arrived and cancel the expired ones.'
+    job = staticmethod(CronHelper.clean_prehabs)
@@ -0,0 +1,7 @@
+from prehab.helpers.CronHelper import CronHelper
+from prehab_app.management.CronCommand import CronCommand
+
+
+class Command(CronCommand):
+    help = 'Date the new patient tasks and mark the overdue ones as not completed.'
+    job = staticmethod(CronHelper.clean_tasks)
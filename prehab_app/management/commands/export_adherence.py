@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from prehab.helpers.AdherenceExport import AdherenceExport
+from prehab.helpers.HttpException import HttpException
+
+
+class Command(BaseCommand):
+    help = 'Export the adherence data of the patient tasks as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', default='csv', choices=sorted(AdherenceExport.CONTENT_TYPES), help='File format.')
+        parser.add_argument('--doctor-id', default=None, help='Only prehabs created by this doctor.')
+        parser.add_argument('--date-from', default=None, help='Only tasks from this day on (dd-mm-yyyy).')
+        parser.add_argument('--date-to', default=None, help='Only tasks until this day (dd-mm-yyyy).')
+        parser.add_argument('--status', default=None, help='Only tasks with this status id.')
+        parser.add_argument('--output', default=None, help='File to write (default: stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            filters = AdherenceExport.parse_filters(options)
+            lines = AdherenceExport.lines(options['type'], AdherenceExport.queryset(**filters))
+        except HttpException as e:
+            raise CommandError(e.http_detail)
+
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        number_of_rows = -1 if options['type'] == 'csv' else 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+                number_of_rows += 1
+
+        self.stderr.write(self.style.SUCCESS('Exported {} rows to {}.'.format(number_of_rows, options['output'])))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from prehab_app.models import Prehab, PrehabStatistics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the prehab statistics table from the patient task schedule.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('prehab_ids', nargs='*', type=int, help='Only rebuild these prehabs (default: all).')
+
+    def handle(self, *args, **options):
+        prehab_ids = options['prehab_ids'] or list(Prehab.objects.values_list('id', flat=True))
+        PrehabStatistics.objects.rebuild(prehab_ids)
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt statistics of {} prehabs.'.format(len(prehab_ids))))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prehab.helpers.PlanBuilder import PlanBuilder
+from prehab_app.models import PlanJob
+
+
+class Command(BaseCommand):
+    help = 'Run the queued plan jobs (prehabs created with ?async). Keeps polling the queue unless --once is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=2, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--limit', type=int, default=None, help='Exit after running this many jobs.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue the failed jobs again before running.')
+
+    def handle(self, *args, **options):
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('--limit must be a positive number.')
+
+        if options['retry_failed']:
+            self.stdout.write('Plan jobs - queued again: {}'.format(PlanJob.objects.retry()))
+
+        total = {'done': 0, 'failed': 0}
+        while True:
+            limit = None if options['limit'] is None else options['limit'] - total['done'] - total['failed']
+            result = PlanBuilder.run_pending(limit=limit)
+            for key, value in result.items():
+                total[key] += value
+            if result['done'] or result['failed']:
+                self.stdout.write('Plan jobs - done: {}, failed: {}'.format(result['done'], result['failed']))
+
+            if options['once'] or (options['limit'] is not None and total['done'] + total['failed'] >= options['limit']):
+                break
+            if not (result['done'] or result['failed']):
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Done. done: {}, failed: {}'.format(total['done'], total['failed'])))
@@ -0,0 +1,30 @@
+# Generated by Django 2.0.2 on 2026-10-18 16:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0010_auto_20180525_0752'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrehabStatistics',
+            fields=[
+                ('prehab', models.OneToOneField(db_column='prehab_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='prehab_app.Prehab')),
+                ('total', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('not_done', models.IntegerField(default=0)),
+                ('with_difficulty', models.IntegerField(default=0)),
+                ('alerts', models.IntegerField(default=0)),
+                ('alerts_unseen', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'prehab_statistics',
+                'ordering': ['-prehab_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.0.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0011_prehabstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CronJobState',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('job', models.CharField(max_length=64, unique=True)),
+                ('watermark', models.DateField(default=None, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'cron_job_state',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='patienttaskschedule',
+            name='date',
+            field=models.DateTimeField(db_column='date', db_index=True, default=None, null=True),
+        ),
+    ]
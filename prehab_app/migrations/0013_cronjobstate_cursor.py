@@ -0,0 +1,23 @@
+# Generated by Django 2.0.2 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0012_cronjobstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronjobstate',
+            name='cursor',
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='cronjobstate',
+            name='cursor_date',
+            field=models.DateField(default=None, null=True),
+        ),
+    ]
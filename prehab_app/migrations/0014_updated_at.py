@@ -0,0 +1,26 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0013_cronjobstate_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patienttaskschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='taskschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
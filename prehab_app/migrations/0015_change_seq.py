@@ -0,0 +1,36 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientmealschedule',
+            name='change_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='patienttaskschedule',
+            name='change_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='prehab',
+            name='change_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='patientmealschedule',
+            index=models.Index(fields=['prehab', 'change_seq'], name='patient_mea_prehab__a55568_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patienttaskschedule',
+            index=models.Index(fields=['prehab', 'change_seq'], name='patient_tas_prehab__92058c_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.0.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0015_change_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.IntegerField(choices=[(1, 'Queued'), (2, 'Running'), (3, 'Done'), (4, 'Failed')], db_index=True, default=1)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.CharField(default=None, max_length=512, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(default=None, null=True)),
+                ('finished_at', models.DateTimeField(default=None, null=True)),
+                ('prehab', models.ForeignKey(db_column='prehab_id', on_delete=django.db.models.deletion.CASCADE, related_name='plan_job', to='prehab_app.Prehab')),
+                ('task_schedule', models.ForeignKey(db_column='task_schedule_id', on_delete=django.db.models.deletion.CASCADE, to='prehab_app.TaskSchedule')),
+            ],
+            options={
+                'db_table': 'plan_job',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
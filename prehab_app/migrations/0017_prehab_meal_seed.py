@@ -0,0 +1,18 @@
+# Generated by Django 2.0.2 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prehab_app', '0016_planjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prehab',
+            name='meal_seed',
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import models
+
+
+class CronJobStateQuerySet(models.QuerySet):
+    def get_watermark(self, job):
+        state = self.filter(job=job).first()
+        return state.watermark if state is not None else None
+
+    def set_watermark(self, job, watermark):
+        self.update_or_create(job=job, defaults={'watermark': watermark})
+
+    def get_cursor(self, job, run_date):
+        """ Last primary key processed by an interrupted run of the job on the given day. """
+        state = self.filter(job=job, cursor_date=run_date).first()
+        return state.cursor if state is not None else None
+
+    def set_cursor(self, job, cursor, run_date):
+        self.update_or_create(job=job, defaults={'cursor': cursor, 'cursor_date': run_date})
+
+
+class CronJobState(models.Model):
+    CLEAN_TASKS = 'clean_tasks'
+    CLEAN_PREHABS = 'clean_prehabs'
+
+    id = models.AutoField(primary_key=True)
+    job = models.CharField(max_length=64, blank=False, null=False, unique=True)
+    # Last day processed by the job - next runs only look at what happened since then
+    watermark = models.DateField(blank=False, null=True, default=None)
+    # Resume point of an interrupted run (last primary key processed) and the day of that run
+    cursor = models.IntegerField(blank=False, null=True, default=None)
+    cursor_date = models.DateField(blank=False, null=True, default=None)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CronJobStateQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'cron_job_state'
+        ordering = ['-id']
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from prehab_app.models.Meal import Meal
 from prehab_app.models.Prehab import Prehab
@@ -28,9 +28,17 @@ class PatientMealSchedule(models.Model):
     day_number = models.IntegerField(blank=False, null=False)
     meal_order = models.IntegerField(choices=order_of_meals, default=BREAKFAST)
     meal = models.ForeignKey(Meal, on_delete=models.CASCADE, db_column='meal_id', related_name='patient_meal')
+    change_seq = models.IntegerField(default=0)
 
     objects = PatientMealScheduleQuerySet.as_manager()
 
     class Meta:
         db_table = 'patient_meal_schedule'
         ordering = ['-id']
+        indexes = [models.Index(fields=['prehab', 'change_seq'])]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            Prehab.objects.filter(pk=self.prehab_id).next_change_seq()
+            self.change_seq = Prehab.objects.values_list('change_seq', flat=True).get(pk=self.prehab_id)
+            super(PatientMealSchedule, self).save(*args, **kwargs)
@@ -1,11 +1,34 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone
 
 from prehab_app.models.Prehab import Prehab
 from prehab_app.models.Task import Task
 
 
 class PatientTaskScheduleQuerySet(models.QuerySet):
-    pass
+    def counters_by_prehab(self):
+        """ Task counters of every prehab in the queryset, computed by one grouped query. """
+        alert = Q(status=PatientTaskSchedule.NOT_COMPLETED) | Q(was_difficult=True)
+        counters = self.order_by() \
+            .values('prehab_id') \
+            .annotate(total=Count('id'),
+                      done=Count('id', filter=Q(status=PatientTaskSchedule.COMPLETED)),
+                      not_done=Count('id', filter=Q(status=PatientTaskSchedule.NOT_COMPLETED)),
+                      with_difficulty=Count('id', filter=Q(was_difficult=True)),
+                      alerts=Count('id', filter=alert),
+                      alerts_unseen=Count('id', filter=alert & Q(seen_by_doctor=False)))
+
+        return {row.pop('prehab_id'): row for row in counters}
+
+    def update_changed(self, **fields):
+        """ Bulk update that stamps the rows with the next change sequence of their prehabs, like save does. """
+        with transaction.atomic():
+            prehab_ids = list(self.order_by().values_list('prehab_id', flat=True).distinct())
+            Prehab.objects.filter(id__in=prehab_ids).next_change_seq()
+            return self.update(change_seq=Subquery(Prehab.objects.filter(pk=OuterRef('prehab_id')).values('change_seq')),
+                               updated_at=timezone.now(),
+                               **fields)
 
 
 class PatientTaskSchedule(models.Model):
@@ -34,13 +57,23 @@ class PatientTaskSchedule(models.Model):
     seen_by_doctor = models.BooleanField(blank=False, null=False, default=False)
     doctor_notes = models.CharField(max_length=256, blank=False, null=True, default="")
 
-    date = models.DateTimeField(blank=False, null=True, default=None, db_column='date')
+    date = models.DateTimeField(blank=False, null=True, default=None, db_column='date', db_index=True)
+    # Row version - bulk updates must set it explicitly (see update_changed)
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.IntegerField(default=0)
 
     objects = PatientTaskScheduleQuerySet.as_manager()
 
     class Meta:
         db_table = 'patient_task_schedule'
         ordering = ['-id']
+        indexes = [models.Index(fields=['prehab', 'change_seq'])]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            Prehab.objects.filter(pk=self.prehab_id).next_change_seq()
+            self.change_seq = Prehab.objects.values_list('change_seq', flat=True).get(pk=self.prehab_id)
+            super(PatientTaskSchedule, self).save(*args, **kwargs)
 
     def get_status_name(self):
         return self.Status[self.status - 1][1]
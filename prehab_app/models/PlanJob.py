@@ -0,0 +1,68 @@
+import datetime
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from prehab_app.models.Prehab import Prehab
+from prehab_app.models.TaskSchedule import TaskSchedule
+
+
+class PlanJobQuerySet(models.QuerySet):
+    def enqueue(self, prehab, task_schedule):
+        return self.create(prehab=prehab, task_schedule=task_schedule)
+
+    def retry(self):
+        """ Queue the failed jobs of this queryset again. Returns how many were queued. """
+        return self.filter(status=PlanJob.FAILED).update(status=PlanJob.QUEUED, error=None, started_at=None,
+                                                         finished_at=None)
+
+    def claim(self):
+        """
+        Take the oldest job waiting to run - or left running for longer than PLAN_JOB_TIMEOUT by a worker that died -
+        and mark it as running. The status change is conditional, so two workers never get the same job.
+        Returns None when there is nothing to do.
+        """
+        stale_date = timezone.now() - datetime.timedelta(seconds=settings.PLAN_JOB_TIMEOUT)
+        candidates = self.filter(Q(status=PlanJob.QUEUED) | Q(status=PlanJob.RUNNING, started_at__lt=stale_date))
+
+        for job in candidates.order_by('id')[:10]:
+            claimed = self.filter(pk=job.pk, status=job.status, started_at=job.started_at).update(
+                status=PlanJob.RUNNING, started_at=timezone.now(), attempts=job.attempts + 1
+            )
+            if claimed == 1:
+                return self.select_related('prehab', 'task_schedule').get(pk=job.pk)
+
+        return None
+
+
+class PlanJob(models.Model):
+    """ Materialization of the tasks and meals of a prehab, run by the run_plan_jobs command. """
+    QUEUED = 1
+    RUNNING = 2
+    DONE = 3
+    FAILED = 4
+
+    Status = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.AutoField(primary_key=True)
+    prehab = models.ForeignKey(Prehab, on_delete=models.CASCADE, db_column='prehab_id', related_name='plan_job')
+    task_schedule = models.ForeignKey(TaskSchedule, on_delete=models.CASCADE, db_column='task_schedule_id')
+    status = models.IntegerField(choices=Status, default=QUEUED, db_index=True)
+    attempts = models.IntegerField(default=0)
+    error = models.CharField(max_length=512, blank=False, null=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=False, null=True, default=None)
+    finished_at = models.DateTimeField(blank=False, null=True, default=None)
+
+    objects = PlanJobQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'plan_job'
+        ordering = ['-id']
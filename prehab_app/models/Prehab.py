@@ -2,13 +2,20 @@ import datetime
 import math
 
 from django.db import models
+from django.db.models import F
 
 from prehab_app.models import Doctor
 from prehab_app.models.Patient import Patient
 
 
 class PrehabQuerySet(models.QuerySet):
-    pass
+    def next_change_seq(self):
+        """
+        Allocate the next change sequence of every prehab in the queryset (see Prehab.change_seq).
+        Call it in the transaction that writes the changes: the prehab rows stay locked until it commits, so the
+        changes of a prehab are committed in sequence order.
+        """
+        return self.update(change_seq=F('change_seq') + 1)
 
 
 class Prehab(models.Model):
@@ -33,6 +40,10 @@ class Prehab(models.Model):
     number_of_weeks = models.IntegerField(blank=False, null=False)
     status = models.IntegerField(choices=Status, default=PENDING)
     created_by = models.ForeignKey(Doctor, on_delete=models.CASCADE, db_column='created_by')
+    # Last change sequence given to its tasks and meals - the sync token of the mobile app
+    change_seq = models.IntegerField(default=0)
+    # Seed of the meal plan draw, to reproduce it (see DataHelper.patient_meal_schedule)
+    meal_seed = models.BigIntegerField(blank=False, null=True, default=None)
 
     objects = PrehabQuerySet.as_manager()
 
@@ -0,0 +1,102 @@
+from django.db import models, transaction
+from django.db.models import F
+
+from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
+from prehab_app.models.Prehab import Prehab
+
+
+class PrehabStatisticsQuerySet(models.QuerySet):
+    def rebuild(self, prehab_ids=None):
+        """
+        Recompute the counters of the given prehabs (all of them if None) from their task schedule.
+        The prehab and statistics rows are locked before the tasks are counted: an apply_delta running meanwhile waits
+        and lands on top of the new counters, and two rebuilds of a missing row don't both insert it.
+        """
+        with transaction.atomic():
+            prehabs = Prehab.objects.select_for_update().order_by('id')
+            if prehab_ids is not None:
+                prehabs = prehabs.filter(id__in=list(prehab_ids))
+            prehab_ids = list(prehabs.values_list('id', flat=True))
+
+            statistics = {s.prehab_id: s for s in self.select_for_update().filter(prehab_id__in=prehab_ids)}
+            counters = PatientTaskSchedule.objects.filter(prehab_id__in=prehab_ids).counters_by_prehab()
+
+            for prehab_id, prehab_statistics in statistics.items():
+                prehab_counters = {counter: 0 for counter in PrehabStatistics.COUNTERS}
+                prehab_counters.update(counters.get(prehab_id, {}))
+                if any(getattr(prehab_statistics, counter) != value for counter, value in prehab_counters.items()):
+                    self.filter(prehab_id=prehab_id).update(**prehab_counters)
+
+            self.bulk_create([
+                PrehabStatistics(prehab_id=prehab_id, **counters.get(prehab_id, {}))
+                for prehab_id in prehab_ids if prehab_id not in statistics
+            ])
+
+    def apply_delta(self, prehab_id, delta):
+        """ Increment (or decrement) the counters of one prehab. Rebuilds the row if it doesn't exist yet. """
+        delta = {counter: value for counter, value in delta.items() if value != 0}
+        if len(delta) == 0:
+            return
+
+        updated = self.filter(prehab_id=prehab_id).update(**{
+            counter: F(counter) + value for counter, value in delta.items()
+        })
+        if updated == 0:
+            self.rebuild([prehab_id])
+
+    def for_prehabs(self, prehabs):
+        """ Statistics of several prehabs indexed by prehab id, rebuilding the ones that are missing. """
+        prehab_ids = [prehab.id for prehab in prehabs]
+        statistics = {s.prehab_id: s for s in self.filter(prehab_id__in=prehab_ids)}
+        missing_ids = [prehab_id for prehab_id in prehab_ids if prehab_id not in statistics]
+        if len(missing_ids) > 0:
+            self.rebuild(missing_ids)
+            statistics.update({s.prehab_id: s for s in self.filter(prehab_id__in=missing_ids)})
+
+        return statistics
+
+
+class PrehabStatistics(models.Model):
+    COUNTERS = ('total', 'done', 'not_done', 'with_difficulty', 'alerts', 'alerts_unseen')
+
+    prehab = models.OneToOneField(Prehab, on_delete=models.CASCADE, db_column='prehab_id', primary_key=True,
+                                  related_name='statistics')
+    total = models.IntegerField(blank=False, null=False, default=0)
+    done = models.IntegerField(blank=False, null=False, default=0)
+    not_done = models.IntegerField(blank=False, null=False, default=0)
+    with_difficulty = models.IntegerField(blank=False, null=False, default=0)
+    alerts = models.IntegerField(blank=False, null=False, default=0)
+    alerts_unseen = models.IntegerField(blank=False, null=False, default=0)
+
+    objects = PrehabStatisticsQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'prehab_statistics'
+        ordering = ['-prehab_id']
+
+    @staticmethod
+    def counters_of(patient_task):
+        """ Contribution of a single task to the counters of its prehab. """
+        is_alert = patient_task.status == PatientTaskSchedule.NOT_COMPLETED or patient_task.was_difficult
+        return {
+            'total': 1,
+            'done': int(patient_task.status == PatientTaskSchedule.COMPLETED),
+            'not_done': int(patient_task.status == PatientTaskSchedule.NOT_COMPLETED),
+            'with_difficulty': int(patient_task.was_difficult),
+            'alerts': int(is_alert),
+            'alerts_unseen': int(is_alert and not patient_task.seen_by_doctor)
+        }
+
+    @staticmethod
+    def delta(counters_before, counters_after):
+        return {counter: counters_after[counter] - counters_before[counter] for counter in counters_after}
+
+    def get_activities_info(self):
+        return {
+            'total_activities': self.total,
+            # Activities already resolved (done or expired)
+            'total_activities_until_now': self.done + self.not_done,
+            'activities_done': self.done,
+            'activities_with_difficulty': self.with_difficulty,
+            'activities_not_done': self.not_done
+        }
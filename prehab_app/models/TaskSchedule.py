@@ -15,6 +15,7 @@ class TaskSchedule(models.Model):
     number_of_weeks = models.IntegerField(blank=False, null=False)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, db_column='created_by')
     is_active = models.BooleanField(blank=False, default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = TaskScheduleQuerySet.as_manager()
 
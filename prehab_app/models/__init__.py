@@ -1,4 +1,5 @@
 from .ConstraintType import ConstraintType
+from .CronJobState import CronJobState
 from .Doctor import Doctor
 from .DoctorPatient import DoctorPatient
 from .Meal import Meal
@@ -7,7 +8,9 @@ from .Patient import Patient
 from .PatientConstraintType import PatientConstraintType
 from .PatientMealSchedule import PatientMealSchedule
 from .PatientTaskSchedule import PatientTaskSchedule
+from .PlanJob import PlanJob
 from .Prehab import Prehab
+from .PrehabStatistics import PrehabStatistics
 from .Role import Role
 from .Task import Task
 from .TaskSchedule import TaskSchedule
@@ -16,6 +19,7 @@ from .WeekTaskSchedule import WeekTaskSchedule
 
 __all__ = [
     'ConstraintType',
+    'CronJobState',
     'Doctor',
     'DoctorPatient',
     'Meal',
@@ -24,7 +28,9 @@ __all__ = [
     'PatientConstraintType',
     'PatientMealSchedule',
     'PatientTaskSchedule',
+    'PlanJob',
     'Prehab',
+    'PrehabStatistics',
     'Role',
     'Task',
     'TaskSchedule',
@@ -1,12 +1,9 @@
 from rest_framework import serializers
 import datetime
 
-from prehab_app.models import TaskSchedule
+from prehab.helpers.CatalogCache import CatalogCache
 from prehab_app.models.Prehab import Prehab
-from prehab_app.serializers.Meal import MealSerializer
-from prehab_app.serializers.PatientMealSchedule import PatientMealScheduleSerializer
-from prehab_app.serializers.PatientTaskSchedule import PatientTaskScheduleSerializer, SimplePatientTaskScheduleSerializer
-from prehab_app.serializers.Task import TaskSerializer, FullTaskSerializer
+from prehab_app.serializers.PatientTaskSchedule import SimplePatientTaskScheduleSerializer
 
 
 class PrehabSerializer(serializers.ModelSerializer):
@@ -16,17 +13,12 @@ class PrehabSerializer(serializers.ModelSerializer):
 
 
 class FullPrehabSerializer(serializers.ModelSerializer):
-    patient_task_schedule = PatientTaskScheduleSerializer(many=True, read_only=True)
-    patient_meal_schedule = PatientMealScheduleSerializer(many=True, read_only=True)
     task_schedule = serializers.SerializerMethodField()
     meal_schedule = serializers.SerializerMethodField()
 
     def to_representation(self, obj):
         data = super(FullPrehabSerializer, self).to_representation(obj)  # the original data
 
-        # data['task']['expected_repetitions'] = data['expected_repetitions']
-        del data['patient_task_schedule']
-        del data['patient_meal_schedule']
         data['status_id'] = data['status']
         data['status'] = obj.get_status_display()
 
@@ -37,9 +29,7 @@ class FullPrehabSerializer(serializers.ModelSerializer):
         """ Perform necessary eager loading of data. """
         queryset = queryset.prefetch_related(
             'patient_task_schedule',
-            'patient_task_schedule__task',
-            'patient_meal_schedule',
-            'patient_meal_schedule__meal'
+            'patient_meal_schedule'
         )
         return queryset
 
@@ -56,7 +46,7 @@ class FullPrehabSerializer(serializers.ModelSerializer):
             if date not in task_schedule:
                 task_schedule[date] = []
 
-            patient_task_info = FullTaskSerializer(patient_task.task, many=False).data
+            patient_task_info = CatalogCache.task(patient_task.task_id)
             patient_task_info['id'] = patient_task.id
             patient_task_info['status_id'] = patient_task.status
             patient_task_info['status'] = patient_task.get_status_display()
@@ -75,7 +65,7 @@ class FullPrehabSerializer(serializers.ModelSerializer):
             if date not in meal_schedule:
                 meal_schedule[date] = []
 
-            patient_meal_info = MealSerializer(patient_meal.meal, many=False).data
+            patient_meal_info = CatalogCache.meal(patient_meal.meal_id)
             patient_meal_info['id'] = patient_meal.id
             patient_meal_info['meal_order_id'] = patient_meal.meal_order
             patient_meal_info['meal_order'] = patient_meal.get_meal_order_display()
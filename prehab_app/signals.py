@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from prehab.helpers.RoleCache import RoleCache
+from prehab_app.models.Role import Role
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def reset_role_cache(sender, **kwargs):
+    RoleCache.invalidate()
@@ -3,6 +3,9 @@ import json
 from django.test import TestCase, Client
 from rest_framework.test import APIClient
 
+from prehab.helpers.CatalogCache import CatalogCache
+from prehab.helpers.MealIndex import MealIndex
+from prehab.helpers.PrehabCache import PrehabCache
 from prehab_app.models import User, Role
 
 
@@ -18,6 +21,9 @@ class TestSuit(TestCase):
 
     def setUp(self):
         self.client = Client()
+        CatalogCache.invalidate()
+        MealIndex.invalidate()
+        PrehabCache.clear()
 
         self.admin_role = Role.objects.get(pk=1)
         self.doctor_role = Role.objects.get(pk=2)
@@ -103,7 +109,7 @@ class TestSuit(TestCase):
                                 content_type='application/json').json()['data']['jwt']
 
     def http_request(self, method, url, body=None, auth_user=None, custom_headers=None, platform='web'):
-        if not url.endswith('/'):
+        if not url.endswith('/') and '?' not in url:
             url += '/'
 
         headers = {'HTTP_PLATFORM': platform}
@@ -0,0 +1,68 @@
+import datetime
+
+from prehab.helpers.BatchProcessor import BatchProcessor
+from prehab_app.models import CronJobState, Doctor, Patient, Prehab
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class BatchProcessorTest(TestSuit):
+    def setUp(self):
+        super(BatchProcessorTest, self).setUp()
+        for _ in range(4):
+            Prehab.objects.create(patient=Patient.objects.get(pk=3), init_date=datetime.date(2018, 5, 22),
+                                  expected_end_date=datetime.date(2018, 6, 5), surgery_date=datetime.date(2018, 6, 6),
+                                  number_of_weeks=2, created_by=Doctor.objects.get(pk=2))
+        self.prehab_ids = list(Prehab.objects.order_by('id').values_list('id', flat=True))
+        self.today = datetime.date(2018, 5, 22)
+
+    def test_chunks(self):
+        chunks = []
+        processor = BatchProcessor('test', Prehab.objects.all(), self.today, chunk_size=2)
+        result = processor.run(lambda first_id, last_id: chunks.append((first_id, last_id)) or {'chunks': 1})
+
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(chunks, [tuple(self.prehab_ids[0:2]), tuple(self.prehab_ids[2:4]), (self.prehab_ids[4],) * 2])
+        self.assertIsNone(CronJobState.objects.get_cursor('test', self.today))
+
+    def test_resume_after_failure(self):
+        def fail_on_second_chunk(first_id, last_id):
+            Prehab.objects.filter(id__gte=first_id, id__lte=last_id).update(status=Prehab.ONGOING)
+            if first_id != self.prehab_ids[0]:
+                raise RuntimeError('Killed')
+            return {}
+
+        processor = BatchProcessor('test', Prehab.objects.all(), self.today, chunk_size=2)
+        with self.assertRaises(RuntimeError):
+            processor.run(fail_on_second_chunk)
+
+        # First chunk was committed, the second one rolled back
+        self.assertEqual(Prehab.objects.filter(status=Prehab.ONGOING).count(), 2)
+        self.assertEqual(CronJobState.objects.get_cursor('test', self.today), self.prehab_ids[1])
+        # An interrupted run is only resumed on the same day
+        self.assertIsNone(CronJobState.objects.get_cursor('test', self.today + datetime.timedelta(days=1)))
+
+        chunks = []
+        result = processor.run(lambda first_id, last_id: chunks.append(first_id) or {})
+        self.assertEqual(result['resumed_from'], self.prehab_ids[1])
+        self.assertEqual(chunks, [self.prehab_ids[2], self.prehab_ids[4]])
+
+    def test_dry_run(self):
+        processor = BatchProcessor('test', Prehab.objects.all(), self.today, chunk_size=2, dry_run=True)
+        result = processor.run(lambda first_id, last_id: {
+            'updated': Prehab.objects.filter(id__gte=first_id, id__lte=last_id).update(status=Prehab.ONGOING)
+        })
+
+        self.assertEqual(result['updated'], 5)
+        self.assertEqual(Prehab.objects.filter(status=Prehab.ONGOING).count(), 0)
+
+    def test_dry_run_after_failure(self):
+        CronJobState.objects.set_cursor('test', self.prehab_ids[1], self.today)
+
+        # The whole queryset is looked at, and the cursor of the interrupted run is reported and kept
+        chunks = []
+        processor = BatchProcessor('test', Prehab.objects.all(), self.today, chunk_size=2, dry_run=True)
+        result = processor.run(lambda first_id, last_id: chunks.append(first_id) or {})
+        self.assertEqual(result['interrupted_at'], self.prehab_ids[1])
+        self.assertNotIn('resumed_from', result)
+        self.assertEqual(chunks, [self.prehab_ids[0], self.prehab_ids[2], self.prehab_ids[4]])
+        self.assertEqual(CronJobState.objects.get_cursor('test', self.today), self.prehab_ids[1])
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+
+from prehab.helpers.BulkWriter import BulkWriter
+from prehab_app.models import PatientMealSchedule, PatientTaskSchedule
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class BulkWriterTest(TestSuit):
+    def test_copy_line(self):
+        self.assertEqual(BulkWriter.copy_line([1, None, True, False, 'a\tb\nc\\d']), '1\t\\N\tt\tf\ta\\tb\\nc\\\\d\n')
+
+    def test_insert_with_bulk_create(self):
+        before = PatientMealSchedule.objects.filter(prehab_id=1).count()
+        meals = (PatientMealSchedule(prehab_id=1, week_number=9, day_number=day_number, meal_order=1, meal_id=1)
+                 for day_number in range(1, 8))
+
+        self.assertEqual(BulkWriter.insert(PatientMealSchedule, meals, batch_size=3), 7)
+        self.assertEqual(PatientMealSchedule.objects.filter(prehab_id=1).count(), before + 7)
+
+    def test_insert_with_copy(self):
+        statements = []
+
+        def copy_expert(sql, buffer):
+            statements.append((sql, buffer.read()))
+
+        postgres = SimpleNamespace(vendor='postgresql', ops=connection.ops, cursor=mock.MagicMock())
+        postgres.cursor.return_value.__enter__.return_value.copy_expert.side_effect = copy_expert
+        tasks = [PatientTaskSchedule(prehab_id=1, week_number=1, day_number=day_number, task_id=1,
+                                     expected_repetitions=1, patient_notes='a\tb')
+                 for day_number in range(1, 6)]
+
+        with mock.patch('prehab.helpers.BulkWriter.connections', {'default': postgres}):
+            self.assertEqual(BulkWriter.insert(PatientTaskSchedule, tasks, batch_size=2), 5)
+
+        self.assertEqual([len(rows.splitlines()) for _, rows in statements], [2, 2, 1])
+        sql, rows = statements[0]
+        self.assertTrue(sql.startswith('COPY "patient_task_schedule" ("prehab_id", "week_number", "day_number"'))
+        self.assertTrue(sql.endswith(') FROM STDIN'))
+        self.assertNotIn('"id"', sql)
+        self.assertIn('\ta\\tb\t', rows)
+        # auto_now is filled in, like bulk_create does
+        self.assertIsNotNone(tasks[0].updated_at)
@@ -0,0 +1,29 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from prehab.helpers.CatalogCache import CatalogCache
+from prehab_app.models import Task
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class CatalogCacheTest(TestSuit):
+    def test_task_catalog(self):
+        task = CatalogCache.task(1)
+        self.assertEqual(task['task_type_id'], Task.objects.get(pk=1).task_type)
+
+        # Served from memory, as a copy
+        task['title'] = 'Changed'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotEqual(CatalogCache.task(1)['title'], 'Changed')
+        self.assertEqual(len(queries.captured_queries), 0)
+
+        # New tasks are loaded on demand
+        new_task = Task.objects.create(title='New Task', task_type=Task.MUSCULAR)
+        self.assertEqual(CatalogCache.task(new_task.id)['title'], 'New Task')
+
+    def test_invalidated_on_create(self):
+        CatalogCache.meal(1)
+        body = {'title': 'New Meal', 'description': 'New Meal', 'meal_type_id': 1, 'constraint_types': [1]}
+        res = self.http_request('post', '/api/meal/', body, 'admin')
+        self.assertEqual(res.status_code, 201)
+        self.assertIsNone(CatalogCache._meals)
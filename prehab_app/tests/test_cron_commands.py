@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from prehab_app.models import CronJobState, PatientTaskSchedule, Prehab
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class CronCommandsTest(TestSuit):
+    def test_clean_tasks_dry_run(self):
+        out = StringIO()
+        call_command('clean_tasks', '--dry-run', stdout=out)
+
+        self.assertIn('[DRY RUN]', out.getvalue())
+        self.assertIn('tasks_expired: {}'.format(PatientTaskSchedule.objects.count()), out.getvalue())
+        self.assertEqual(PatientTaskSchedule.objects.filter(status=PatientTaskSchedule.NOT_COMPLETED).count(), 0)
+        self.assertEqual(PatientTaskSchedule.objects.filter(date__isnull=False).count(), 0)
+        self.assertIsNone(CronJobState.objects.get_watermark(CronJobState.CLEAN_TASKS))
+
+    def test_clean_tasks(self):
+        out = StringIO()
+        call_command('clean_tasks', '--chunk-size', '1', stdout=out)
+
+        self.assertIn('Chunk 1/1', out.getvalue())
+        self.assertEqual(PatientTaskSchedule.objects.filter(status=PatientTaskSchedule.PENDING).count(), 0)
+        self.assertIsNotNone(CronJobState.objects.get_watermark(CronJobState.CLEAN_TASKS))
+
+    def test_clean_prehabs(self):
+        out = StringIO()
+        call_command('clean_prehabs', '--dry-run', stdout=out)
+        self.assertIn('prehabs_started: 1', out.getvalue())
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.PENDING)
+
+        # Prehab started before the given day
+        call_command('clean_prehabs', '--since', '23-05-2018', stdout=out)
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.PENDING)
+
+        call_command('clean_prehabs', '--since', '22-05-2018', stdout=out)
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.ONGOING)
+
+    def test_invalid_since(self):
+        # Reported by argparse as a usage error of the option
+        with self.assertRaisesRegex(CommandError, 'argument --since: Invalid date 2018-05-22'):
+            call_command('clean_tasks', '--since', '2018-05-22')
@@ -0,0 +1,57 @@
+from prehab.helpers.DataHelper import DataHelper
+from prehab.helpers.HttpException import HttpException
+from prehab_app.models import Meal, Task, TaskSchedule, WeekTaskSchedule
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class DataHelperTest(TestSuit):
+    @staticmethod
+    def build_task_schedule(number_of_weeks, tasks_per_week=5):
+        task_schedule = TaskSchedule.objects.create(title='{} weeks'.format(number_of_weeks),
+                                                    number_of_weeks=number_of_weeks, created_by_id=1)
+        tasks = list(Task.objects.all()[:tasks_per_week])
+        WeekTaskSchedule.objects.bulk_create(
+            WeekTaskSchedule(task_schedule=task_schedule, week_number=week_number, task=task,
+                             times_per_week=1 + (week_number + idx) % 7, repetition_number=10)
+            for week_number in range(1, number_of_weeks + 1) for idx, task in enumerate(tasks)
+        )
+        return task_schedule
+
+    def test_work_load_distribution(self):
+        task_schedule = self.build_task_schedule(2, tasks_per_week=2)
+        rows = list(DataHelper.patient_task_schedule_work_load(task_schedule))
+
+        # week 1: 2 + 3 times, week 2: 3 + 4 times
+        self.assertEqual(len(rows), 12)
+        self.assertEqual([row['week_number'] for row in rows], [1] * 5 + [2] * 7)
+        for week_number in (1, 2):
+            days = [row['day_number'] for row in rows if row['week_number'] == week_number]
+            self.assertEqual(days, sorted(days))
+        self.assertEqual(len({row['day_number'] for row in rows if row['week_number'] == 1}), 5)
+
+    def test_work_load_single_query(self):
+        for number_of_weeks in (4, 12, 52):
+            task_schedule = self.build_task_schedule(number_of_weeks)
+            expected_rows = sum(w.times_per_week for w in task_schedule.week_task_schedule.all())
+
+            with self.assertNumQueries(1):
+                rows = list(DataHelper.patient_task_schedule_work_load(task_schedule))
+                for row in rows:
+                    self.assertIsNotNone(row['task'].title)
+
+            self.assertEqual(len(rows), expected_rows)
+
+    def test_meal_schedule(self):
+        rows = list(DataHelper.patient_meal_schedule(4, [], seed=7))
+        self.assertEqual(len(rows), 4 * 7 * 5)
+        self.assertEqual(rows, list(DataHelper.patient_meal_schedule(4, [], seed=7)))
+        self.assertEqual(rows[:5], [(1, 1, 1, rows[0][3]), (1, 1, 2, rows[1][3]), (1, 1, 3, rows[2][3]),
+                                    (1, 1, 4, rows[3][3]), (1, 1, 5, rows[4][3])])
+
+        meal_types = dict(Meal.objects.values_list('id', 'meal_type'))
+        expected_types = {1: Meal.BREAKFAST, 2: Meal.SNACK, 3: Meal.FULL_MEAL, 4: Meal.SNACK, 5: Meal.FULL_MEAL}
+        for week_number, day_number, meal_order, meal_id in rows:
+            self.assertEqual(meal_types[meal_id], expected_types[meal_order])
+
+        with self.assertRaises(HttpException):
+            list(DataHelper.patient_meal_schedule(1, [1, 2, 3, 4, 5]))
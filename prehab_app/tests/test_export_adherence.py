@@ -0,0 +1,46 @@
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from prehab_app.models import PatientTaskSchedule
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class ExportAdherenceCommandTest(TestSuit):
+    def test_export_to_stdout(self):
+        out = StringIO()
+        call_command('export_adherence', '--type', 'ndjson', stdout=out)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(record['patient_task_schedule_id'] for record in records),
+                         sorted(PatientTaskSchedule.objects.values_list('id', flat=True)))
+
+    def test_export_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'adherence.csv')
+            call_command('export_adherence', '--output', output, '--doctor-id', '1', stderr=StringIO())
+
+            with open(output, encoding='utf-8') as exported:
+                self.assertEqual(len(exported.read().splitlines()), PatientTaskSchedule.objects.count() + 1)
+
+    def test_date_filters(self):
+        task_ids = list(PatientTaskSchedule.objects.order_by('id').values_list('id', flat=True)[:3])
+        for task_id, date in zip(task_ids, ('2018-05-21 23:59:59', '2018-05-22 00:00:00', '2018-05-22 23:59:59')):
+            PatientTaskSchedule.objects.filter(pk=task_id).update(
+                date=timezone.make_aware(datetime.datetime.strptime(date, '%Y-%m-%d %H:%M:%S')))
+
+        out = StringIO()
+        call_command('export_adherence', '--type', 'ndjson', '--date-from', '22-05-2018', '--date-to', '22-05-2018',
+                     stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['patient_task_schedule_id'] for record in records], task_ids[1:])
+
+    def test_invalid_filters(self):
+        with self.assertRaises(CommandError):
+            call_command('export_adherence', '--date-to', '31/12/2018', stdout=StringIO())
@@ -0,0 +1,38 @@
+from prehab.helpers.MealIndex import MealIndex
+from prehab_app.models import Meal, MealConstraintType
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class MealIndexTest(TestSuit):
+    def test_available_meals(self):
+        available_meals = MealIndex.available([1, 4])
+        expected = set(MealConstraintType.objects.filter(constraint_type=1).values_list('meal_id', flat=True)) & \
+            set(MealConstraintType.objects.filter(constraint_type=4).values_list('meal_id', flat=True))
+        self.assertEqual({meal_id for ids in available_meals.values() for meal_id in ids}, expected)
+        for meal_type, ids in available_meals.items():
+            self.assertEqual(set(Meal.objects.filter(id__in=ids).values_list('meal_type', flat=True)) - {meal_type},
+                             set())
+
+        # Without constraints every meal is available
+        self.assertEqual(sum(len(ids) for ids in MealIndex.available([]).values()), Meal.objects.count())
+
+        # Same constraint set, in any order, is served from memory after checking the meal table version
+        with self.assertNumQueries(1):
+            self.assertIs(MealIndex.available((4, 1)), available_meals)
+
+    def test_rebuilt_on_create(self):
+        self.assertEqual(MealIndex.available([1, 2, 3, 4])[Meal.BREAKFAST], ())
+
+        body = {'title': 'New Meal', 'description': 'New Meal', 'meal_type_id': 1, 'constraint_types': [1, 2, 3, 4]}
+        res = self.http_request('post', '/api/meal/', body, 'admin')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(MealIndex.available([1, 2, 3, 4])[Meal.BREAKFAST], (res.json()['details']['meal_id'],))
+
+    def test_rebuilt_on_meals_added_elsewhere(self):
+        self.assertEqual(MealIndex.available([1, 2, 3, 4])[Meal.SNACK], ())
+
+        # As another web worker or the plan job worker would see it: the cache of this process wasn't invalidated
+        meal = Meal.objects.create(title='New Meal', meal_type=Meal.SNACK)
+        MealConstraintType.objects.bulk_create(MealConstraintType(meal=meal, constraint_type_id=constraint_type_id)
+                                               for constraint_type_id in (1, 2, 3, 4))
+        self.assertEqual(MealIndex.available([1, 2, 3, 4])[Meal.SNACK], (meal.id,))
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from django.test import override_settings
+
+from prehab.helpers.RoleCache import RoleCache
+from prehab.permissions import Permission
+from prehab_app.models import Role
+from prehab_app.tests.TestSuit import TestSuit
+
+
+@override_settings(PERMISSIONS=True)
+class RoleCacheTest(TestSuit):
+    def setUp(self):
+        super(RoleCacheTest, self).setUp()
+        RoleCache.invalidate()
+
+    def test_verify_without_queries(self):
+        doctor = SimpleNamespace(ROLE_ID=self.doctor_role.id)
+        patient = SimpleNamespace(ROLE_ID=self.patient_role.id)
+
+        self.assertTrue(Permission.verify(doctor, ['Admin', 'Doctor']))
+        with self.assertNumQueries(0):
+            self.assertTrue(Permission.verify(doctor, ['Admin', 'Doctor']))
+            self.assertFalse(Permission.verify(patient, ['Admin', 'Doctor']))
+            self.assertFalse(Permission.verify(doctor, ['Unknown']))
+
+    def test_role_changes_reset_the_cache(self):
+        request = SimpleNamespace(ROLE_ID=self.patient_role.id)
+        self.assertFalse(Permission.verify(request, ['Caregiver']))
+
+        Role.objects.filter(pk=self.patient_role.id).update(title='Caregiver')
+        self.assertFalse(Permission.verify(request, ['Caregiver']))
+
+        role = Role.objects.get(pk=self.patient_role.id)
+        role.save()
+        self.assertTrue(Permission.verify(request, ['Caregiver']))
+        self.assertFalse(Permission.verify(request, ['Patient']))
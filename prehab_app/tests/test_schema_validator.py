@@ -1,4 +1,9 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
 
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.SchemaValidator import SchemaValidator
@@ -43,3 +48,25 @@ class HttpResponseHandlerTest(TestCase):
         except HttpException as e:
             self.assertEqual(e.http_code, 400)
             self.assertEqual(e.http_detail, 'File prehab_app/schemas/test/test2.json not found')
+
+    def test_validators_are_precompiled(self):
+        self.assertIn('prehab/create.json', SchemaValidator._validators)
+        with mock.patch('builtins.open', side_effect=AssertionError('schema read from disk')):
+            self.assertIsNone(SchemaValidator.validate_obj_structure({"required_string": "s"}, 'test/test1.json'))
+
+    @override_settings(DEBUG=True)
+    def test_reload_in_debug(self):
+        with tempfile.TemporaryDirectory() as schema_dir, \
+                mock.patch('prehab.helpers.SchemaValidator.SCHEMA_DIR', schema_dir), \
+                mock.patch.object(SchemaValidator, '_validators', {}):
+            path = os.path.join(schema_dir, 'reload.json')
+            with open(path, 'w') as schema_file:
+                json.dump({"type": "object", "required": ["a"]}, schema_file)
+            self.assertIsNone(SchemaValidator.validate_obj_structure({"a": 1}, 'reload.json'))
+
+            with open(path, 'w') as schema_file:
+                json.dump({"type": "object", "required": ["b"]}, schema_file)
+            os.utime(path, (0, 0))
+            with self.assertRaises(HttpException) as context:
+                SchemaValidator.validate_obj_structure({"a": 1}, 'reload.json')
+            self.assertEqual(context.exception.http_detail, 'Validation Error. Parameter b is a required property')
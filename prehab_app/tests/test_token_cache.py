@@ -0,0 +1,89 @@
+import time
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from prehab.helpers.TokenCache import TokenCache
+from prehab_app.models import Prehab
+from prehab_app.tests.TestSuit import TestSuit
+
+
+class TokenCacheTest(TestSuit):
+    def setUp(self):
+        super(TokenCacheTest, self).setUp()
+        TokenCache.clear()
+
+    @staticmethod
+    def encode(payload):
+        return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM).decode('utf-8')
+
+    def test_token_is_verified_once(self):
+        with mock.patch('prehab.helpers.TokenCache.jwt.decode', wraps=jwt.decode) as decode:
+            for _ in range(3):
+                res = self.http_request('get', '/api/prehab/', auth_user='admin')
+                self.assertEqual(res.status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+        identity = TokenCache.identity(self.admin_jwt)
+        self.assertEqual((identity.user_id, identity.role_id), (1, 1))
+        self.assertTrue(identity.is_admin)
+        self.assertFalse(identity.is_doctor or identity.is_patient)
+
+    def test_expired_tokens(self):
+        token = self.encode({'user_id': 1, 'role_id': 1, 'exp': int(time.time()) + 60})
+        self.assertEqual(TokenCache.identity(token).user_id, 1)
+
+        # The cached entry doesn't outlive the token - it is verified again
+        with mock.patch('prehab.helpers.TokenCache.time.time', return_value=time.time() + 120), \
+                mock.patch('prehab.helpers.TokenCache.jwt.decode', side_effect=jwt.ExpiredSignatureError) as decode:
+            with self.assertRaises(jwt.ExpiredSignatureError):
+                TokenCache.identity(token)
+        self.assertEqual(decode.call_count, 1)
+
+        token = self.encode({'user_id': 1, 'role_id': 1, 'exp': int(time.time()) - 60})
+        res = self.http_request('get', '/api/prehab/', custom_headers={'HTTP_JWT': token})
+        self.assertEqual(res.status_code, 401)
+
+    def test_invalid_tokens(self):
+        res = self.http_request('get', '/api/prehab/', custom_headers={'HTTP_JWT': 'not.a.token'})
+        self.assertEqual(res.status_code, 401)
+
+        with self.assertRaises(jwt.InvalidTokenError):
+            TokenCache.identity(self.encode({'user_id': 1}))
+
+    @override_settings(JWT_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        tokens = [self.encode({'user_id': user_id, 'role_id': 3}) for user_id in range(3)]
+        for token in tokens:
+            TokenCache.identity(token)
+        TokenCache.identity(tokens[1])
+
+        # The least recently used token was evicted
+        with mock.patch('prehab.helpers.TokenCache.jwt.decode', wraps=jwt.decode) as decode:
+            TokenCache.identity(tokens[1])
+            TokenCache.identity(tokens[2])
+            self.assertEqual(decode.call_count, 0)
+            TokenCache.identity(tokens[0])
+            self.assertEqual(decode.call_count, 1)
+
+    def test_views_use_the_identity(self):
+        # The caller is known from the token: creating a plan doesn't look up its user, doctor or role
+        Prehab.objects.filter(patient_id=3).delete()
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.http_request('post', '/api/prehab/', body, auth_user='admin')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Prehab.objects.get(patient_id=3).created_by_id, 1)
+
+        lookups = [query['sql'] for query in queries.captured_queries
+                   if 'FROM "doctor"' in query['sql'] or 'FROM "users"' in query['sql'] or 'FROM "role"' in query['sql']]
+        self.assertEqual(lookups, [])
@@ -1,6 +1,8 @@
 import datetime
+from unittest import mock
 
-from prehab_app.models import Prehab, Patient, Doctor, PatientTaskSchedule
+from prehab.helpers.CronHelper import CronHelper
+from prehab_app.models import Prehab, Patient, Doctor, PatientTaskSchedule, PrehabStatistics
 from prehab_app.tests.TestSuit import TestSuit
 
 
@@ -9,8 +11,60 @@ class AuthViewTests(TestSuit):
 
     def test_clean_tasks(self):
         # SUCCESS
+        pending_tasks = PatientTaskSchedule.objects.filter(prehab_id=1, status=PatientTaskSchedule.PENDING).count()
         res = self.http_request('post', self.login_path_url + 'tasks/', {})
         self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['tasks_expired'], pending_tasks)
+        self.assertEqual(res.json()['data']['dates_updated'], PatientTaskSchedule.objects.filter(prehab_id=1).count())
+
+        patient_task = PatientTaskSchedule.objects.filter(prehab_id=1, week_number=2, day_number=3).first()
+        self.assertEqual(patient_task.date.date(), datetime.date(2018, 5, 31))
+        self.assertEqual(patient_task.status, PatientTaskSchedule.NOT_COMPLETED)
+        self.assertEqual(PrehabStatistics.objects.get(prehab_id=1).not_done, pending_tasks)
+
+        # Nothing left to do
+        res = self.http_request('post', self.login_path_url + 'tasks/', {})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['tasks_expired'], 0)
+        self.assertEqual(res.json()['data']['dates_updated'], 0)
+
+    def test_clean_tasks_without_task_date_sql(self):
+        # Databases without TASK_DATE_SQL get the same dates through the ORM
+        with mock.patch.dict(CronHelper.TASK_DATE_SQL, clear=True):
+            result = CronHelper.clean_tasks(today=datetime.date(2018, 5, 25))
+        self.assertEqual(result['dates_updated'], PatientTaskSchedule.objects.filter(prehab_id=1).count())
+
+        tasks = PatientTaskSchedule.objects.filter(prehab_id=1).order_by('id')
+        dates = list(tasks.values_list('id', 'date'))
+        self.assertEqual(tasks.filter(week_number=2, day_number=3).first().date.date(), datetime.date(2018, 5, 31))
+
+        tasks.update(date=None)
+        CronHelper.clean_tasks(today=datetime.date(2018, 5, 25))
+        self.assertEqual(list(tasks.values_list('id', 'date')), dates)
+
+    def test_clean_tasks_since_watermark(self):
+        def expired_days():
+            return sorted({t.date.day for t in PatientTaskSchedule.objects.filter(
+                prehab_id=1, status=PatientTaskSchedule.NOT_COMPLETED)})
+
+        def days_with_tasks(first_day, last_day):
+            return sorted({t.date.day for t in PatientTaskSchedule.objects.filter(prehab_id=1)
+                           if first_day <= t.date.day <= last_day})
+
+        result = CronHelper.clean_tasks(today=datetime.date(2018, 5, 25))
+        self.assertIsNone(result['watermark'])
+        self.assertEqual(expired_days(), days_with_tasks(22, 24))
+
+        # Missed runs are caught up
+        result = CronHelper.clean_tasks(today=datetime.date(2018, 5, 28))
+        self.assertEqual(result['watermark'], datetime.date(2018, 5, 25))
+        self.assertEqual(result['dates_updated'], 0)
+        self.assertEqual(expired_days(), days_with_tasks(22, 27))
+
+        # Days before the watermark are not scanned again
+        PatientTaskSchedule.objects.filter(prehab_id=1, date__day=22).update(status=PatientTaskSchedule.PENDING)
+        CronHelper.clean_tasks(today=datetime.date(2018, 5, 29))
+        self.assertEqual(expired_days(), days_with_tasks(23, 28))
 
     def test_clean_prehabs(self):
         # body = {
@@ -24,3 +78,27 @@ class AuthViewTests(TestSuit):
         # SUCCESS
         res = self.http_request('post', self.login_path_url + 'prehabs/', {})
         self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['prehabs_started'], 1)
+        self.assertEqual(res.json()['data']['prehabs_canceled'], 0)
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.ONGOING)
+
+        # Prehab ended more than 30 days ago
+        res = self.http_request('post', self.login_path_url + 'prehabs/', {})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['prehabs_started'], 0)
+        self.assertEqual(res.json()['data']['prehabs_canceled'], 1)
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.CANCEL)
+        self.assertEqual(Prehab.objects.get(pk=1).actual_end_date, datetime.date.today())
+
+    def test_clean_prehabs_before_expiration(self):
+        CronHelper.clean_prehabs(today=datetime.date(2018, 5, 21))
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.PENDING)
+
+        CronHelper.clean_prehabs(today=datetime.date(2018, 5, 22))
+        self.assertEqual(Prehab.objects.get(pk=1).status, Prehab.ONGOING)
+
+        result = CronHelper.clean_prehabs(today=datetime.date(2018, 7, 4))
+        self.assertEqual(result['prehabs_canceled'], 0)
+
+        result = CronHelper.clean_prehabs(today=datetime.date(2018, 7, 5))
+        self.assertEqual(result['prehabs_canceled'], 1)
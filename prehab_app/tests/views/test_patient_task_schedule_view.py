@@ -1,3 +1,8 @@
+import json
+from unittest import mock
+
+from prehab.helpers.HttpResponseHandler import HTTP
+from prehab_app.models import PatientTaskSchedule, PrehabStatistics
 from prehab_app.tests.TestSuit import TestSuit
 
 
@@ -50,3 +55,147 @@ class FullTaskViewTests(TestSuit):
         # Test Delete
         res = self.http_request('delete', self.full_patient_task_schedule_path_url + '1', auth_user='patient')
         self.assertEqual(res.status_code, 405)
+
+    def test_prehab_statistics_are_updated(self):
+        statistics = PrehabStatistics.objects.get(prehab_id=1)
+        self.assertEqual(statistics.total, PatientTaskSchedule.objects.filter(prehab_id=1).count())
+
+        body = {
+            "patient_task_schedule_id": 17,
+            "completed": False,
+            "difficulties": True
+        }
+        res = self.http_request('put', self.full_patient_task_schedule_path_url + 'done/', body, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+
+        statistics.refresh_from_db()
+        self.assertEqual(statistics.not_done, 1)
+        self.assertEqual(statistics.with_difficulty, 1)
+        self.assertEqual(statistics.alerts_unseen, 1)
+
+        res = self.http_request('put', '/api/patient/schedule/seen/bulk/', {"prehab_id": 1}, auth_user='doctor')
+        self.assertEqual(res.status_code, 200)
+
+        statistics.refresh_from_db()
+        self.assertEqual(statistics.alerts, 1)
+        self.assertEqual(statistics.alerts_unseen, 0)
+
+        # Incremental counters must match the ones computed from scratch
+        counters = PatientTaskSchedule.objects.filter(prehab_id=1).counters_by_prehab()[1]
+        self.assertEqual({counter: getattr(statistics, counter) for counter in counters}, counters)
+
+    def test_statistics_updated_with_the_task(self):
+        statistics = PrehabStatistics.objects.get(prehab_id=1)
+        body = {
+            "patient_task_schedule_id": 17,
+            "completed": True,
+            "difficulties": False
+        }
+        # The task change is rolled back if the statistics can't be updated
+        with mock.patch.object(PrehabStatistics.objects, 'apply_delta', side_effect=RuntimeError('lost')):
+            res = self.http_request('put', self.full_patient_task_schedule_path_url + 'done/', body,
+                                    auth_user='patient')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(PatientTaskSchedule.objects.get(pk=17).status, PatientTaskSchedule.PENDING)
+        statistics.refresh_from_db()
+        self.assertEqual(statistics.done, 0)
+
+        res = self.http_request('put', self.full_patient_task_schedule_path_url + 'done/', body, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        statistics.refresh_from_db()
+        self.assertEqual(statistics.done, 1)
+
+    def test_rebuild_statistics(self):
+        counters = PatientTaskSchedule.objects.filter(prehab_id=1).counters_by_prehab()[1]
+
+        # Existing rows are corrected in place
+        PrehabStatistics.objects.filter(prehab_id=1).update(done=7, alerts=3)
+        PrehabStatistics.objects.rebuild([1])
+        statistics = PrehabStatistics.objects.get(prehab_id=1)
+        self.assertEqual({counter: getattr(statistics, counter) for counter in counters}, counters)
+
+        # Missing rows are created, only for prehabs that exist
+        PrehabStatistics.objects.filter(prehab_id=1).delete()
+        PrehabStatistics.objects.rebuild([1, 999])
+        self.assertEqual(list(PrehabStatistics.objects.values_list('prehab_id', flat=True)), [1])
+        statistics = PrehabStatistics.objects.get(prehab_id=1)
+        self.assertEqual({counter: getattr(statistics, counter) for counter in counters}, counters)
+
+    def test_conditional_get(self):
+        patient_task = PatientTaskSchedule.objects.filter(prehab_id=1).first()
+        url = self.full_patient_task_schedule_path_url + str(patient_task.id)
+
+        res = self.http_request('get', url, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+        res = self.http_request('get', url, auth_user='patient', custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 304)
+
+        res = self.http_request('get', self.full_patient_task_schedule_path_url, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        list_etag = res['ETag']
+        res = self.http_request('get', self.full_patient_task_schedule_path_url, auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': list_etag})
+        self.assertEqual(res.status_code, 304)
+
+        # Marking the task as done changes both versions
+        body = {
+            "patient_task_schedule_id": patient_task.id,
+            "completed": True,
+            "difficulties": False
+        }
+        res = self.http_request('put', self.full_patient_task_schedule_path_url + 'done/', body, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+
+        res = self.http_request('get', url, auth_user='patient', custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        res = self.http_request('get', self.full_patient_task_schedule_path_url, auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': list_etag})
+        self.assertEqual(res.status_code, 200)
+
+    def test_stream_all_patient_task_schedules(self):
+        # Small chunks, so the rows are encoded in several of them
+        with mock.patch.object(HTTP, 'STREAM_CHUNK_SIZE', 7):
+            res = self.http_request('get', self.full_patient_task_schedule_path_url + '?stream', auth_user='admin')
+            self.assertEqual(res.status_code, 200)
+            self.assertTrue(res.streaming)
+            body = json.loads(b''.join(res.streaming_content).decode('utf-8'))
+
+        self.assertEqual(body['code'], 200)
+        self.assertEqual(body['message'], 'Success')
+        self.assertEqual([record['id'] for record in body['data']],
+                         list(PatientTaskSchedule.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_export_adherence(self):
+        number_of_tasks = PatientTaskSchedule.objects.count()
+
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export?type=csv', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        lines = b''.join(res.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['patient_task_schedule_id', 'prehab_id', 'prehab_status'])
+        self.assertEqual(len(lines), number_of_tasks + 1)
+
+        # Filters
+        patient_task = PatientTaskSchedule.objects.first()
+        patient_task.status = PatientTaskSchedule.COMPLETED
+        patient_task.save()
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export?type=ndjson&status=2',
+                                auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        records = [json.loads(line) for line in b''.join(res.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([record['patient_task_schedule_id'] for record in records], [patient_task.id])
+
+        # Doctors only get their own prehabs
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export?type=ndjson&doctor_id=1',
+                                auth_user='doctor')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'')
+
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export?type=xml', auth_user='admin')
+        self.assertEqual(res.status_code, 400)
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export?date_from=2018',
+                                auth_user='admin')
+        self.assertEqual(res.status_code, 400)
+        res = self.http_request('get', self.full_patient_task_schedule_path_url + 'export', auth_user='patient')
+        self.assertEqual(res.status_code, 401)
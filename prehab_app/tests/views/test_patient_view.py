@@ -1,6 +1,6 @@
 import datetime
 
-from prehab_app.models import Prehab, Patient, Doctor
+from prehab_app.models import Prehab, Patient, Doctor, PatientTaskSchedule
 from prehab_app.tests.TestSuit import TestSuit
 
 
@@ -90,6 +90,12 @@ class AuthViewTests(TestSuit):
     def test_get_statistics(self):
         # Test Update
         res = self.http_request('get', self.patient_path_url + '3/statistics/', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['total_activities'], PatientTaskSchedule.objects.filter(prehab_id=1).count())
+
+        # Patient without prehab
+        Prehab.objects.filter(patient_id=3).delete()
+        res = self.http_request('get', self.patient_path_url + '3/statistics/', auth_user='admin')
         self.assertEqual(res.status_code, 400)
 
     def test_add_second_doctor(self):
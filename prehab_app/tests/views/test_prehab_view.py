@@ -1,3 +1,16 @@
+import datetime
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from prehab.helpers.PlanBuilder import PlanBuilder
+from prehab.helpers.PrehabCache import PrehabCache
+from prehab.pagination import IdCursorPagination
+from prehab_app.models import Doctor, DoctorPatient, Patient, PatientConstraintType, PatientMealSchedule, \
+    PatientTaskSchedule, PlanJob, Prehab, PrehabStatistics, Role, Task, User
 from prehab_app.tests.TestSuit import TestSuit
 
 
@@ -50,3 +63,486 @@ class PrehabViewTests(TestSuit):
         # Test Delete
         res = self.http_request('delete', self.prehab_path_url + '0', auth_user='patient')
         self.assertEqual(res.status_code, 405)
+
+    def test_list_prehabs(self):
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        info = res.json()['data'][0]['info']
+        self.assertEqual(info['total_activities'], PatientTaskSchedule.objects.filter(prehab_id=1).count())
+        self.assertEqual(info['patient_id'], 3)
+
+    def test_list_prehabs_query_count(self):
+        # Benchmark - the number of queries can't grow with the number of prehabs in the page
+        self._create_prehabs(1)
+        with CaptureQueriesContext(connection) as small_page:
+            res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+
+        self._create_prehabs(20)
+        with CaptureQueriesContext(connection) as big_page:
+            res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()['data']), 22)
+
+        self.assertEqual(len(small_page.captured_queries), len(big_page.captured_queries))
+
+    def test_list_prehabs_with_cursor(self):
+        self._create_prehabs(4)
+        prehab_ids = list(Prehab.objects.order_by('-id').values_list('id', flat=True))
+
+        with mock.patch.object(IdCursorPagination, 'page_size', 2):
+            # Empty cursor -> first page
+            res = self.http_request('get', self.prehab_path_url + '?cursor=', auth_user='admin')
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn('count', res.json())
+            self.assertIsNone(res.json()['previous_cursor'])
+
+            listed_ids = [prehab['id'] for prehab in res.json()['data']]
+            while res.json()['next_cursor'] is not None:
+                res = self.http_request('get', self.prehab_path_url + '?cursor=' + res.json()['next_cursor'],
+                                        auth_user='admin')
+                self.assertEqual(res.status_code, 200)
+                listed_ids += [prehab['id'] for prehab in res.json()['data']]
+            self.assertEqual(listed_ids, prehab_ids)
+
+            # And back
+            res = self.http_request('get', self.prehab_path_url + '?cursor=' + res.json()['previous_cursor'],
+                                    auth_user='admin')
+            self.assertEqual([prehab['id'] for prehab in res.json()['data']], prehab_ids[2:4])
+
+        # Page numbers are still the default
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.json()['count'], len(prehab_ids))
+
+    def _create_prehabs(self, number_of_prehabs):
+        doctor = Doctor.objects.get(pk=self.doctor_user.pk)
+        task = Task.objects.first()
+        for _ in range(number_of_prehabs):
+            user = User.objects.create(name='Anónimo', username='', role=Role.objects.patient_role().get(),
+                                       activation_code='ABCDEFGH', is_active=True)
+            patient = Patient.objects.create(user=user, patient_tag='TAG', age=50, height=1.7, weight=70, sex='M')
+            prehab = Prehab.objects.create(patient=patient, init_date=datetime.date.today(),
+                                           expected_end_date=datetime.date.today() + datetime.timedelta(days=28),
+                                           surgery_date=datetime.date.today() + datetime.timedelta(days=30),
+                                           number_of_weeks=4, created_by=doctor)
+            PatientTaskSchedule.objects.bulk_create([
+                PatientTaskSchedule(prehab=prehab, week_number=week_number, day_number=day_number, task=task)
+                for week_number in range(1, 5) for day_number in range(1, 8)
+            ])
+
+    def test_retrieve_prehab_query_count(self):
+        # Loading the prehab with all its tasks, meals, constraints and doctors doesn't take a query per row
+        def count_queries():
+            PrehabCache.bump(1)
+            with CaptureQueriesContext(connection) as queries:
+                res = self.http_request('get', self.prehab_path_url + '1', auth_user='admin')
+            self.assertEqual(res.status_code, 200)
+            return len(queries.captured_queries), res.json()['data']
+
+        PatientConstraintType.objects.create(patient_id=3, constraint_type_id=1)
+        count_queries()  # loads the catalogs
+        one_row_queries, data = count_queries()
+        self.assertEqual(len(data['doctors']), 1)
+        self.assertEqual(len(data['patient']['patient_constraints']), 1)
+
+        task = PatientTaskSchedule.objects.filter(prehab_id=1).first()
+        meal = PatientMealSchedule.objects.filter(prehab_id=1).first()
+        PatientTaskSchedule.objects.bulk_create([
+            PatientTaskSchedule(prehab_id=1, week_number=3, day_number=day_number, task_id=task.task_id)
+            for day_number in range(1, 8)
+        ])
+        PatientMealSchedule.objects.bulk_create([
+            PatientMealSchedule(prehab_id=1, week_number=3, day_number=day_number, meal_order=1, meal_id=meal.meal_id)
+            for day_number in range(1, 8)
+        ])
+        for constraint_type_id in range(2, 5):
+            PatientConstraintType.objects.create(patient_id=3, constraint_type_id=constraint_type_id)
+        DoctorPatient.objects.create(doctor_id=self.doctor_user.pk, patient_id=3)
+
+        n_rows_queries, data = count_queries()
+        self.assertEqual(len(data['doctors']), 2)
+        self.assertEqual(len(data['patient']['patient_constraints']), 4)
+        self.assertEqual(n_rows_queries, one_row_queries)
+
+    def test_retrieve_prehab_uses_catalog_cache(self):
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+
+        # Tasks and meals come from the catalog cache after the first request, however many the plan has
+        PrehabCache.bump(1)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.http_request('get', self.prehab_path_url + '1', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(sum(len(tasks) for tasks in res.json()['data']['task_schedule'].values()), 0)
+        self.assertGreater(sum(len(meals) for meals in res.json()['data']['meal_schedule'].values()), 0)
+        self.assertEqual([q['sql'] for q in queries.captured_queries
+                          if 'FROM "task"' in q['sql'] or 'FROM "meal"' in q['sql']], [])
+
+    def test_retrieve_prehab_cache(self):
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['statistics']['activities_done'], 0)
+
+        # Repeated fetches read the prehab version and the patient and doctors, not the plan
+        with CaptureQueriesContext(connection) as queries:
+            res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'patient_task_schedule' in q['sql'] or 'patient_meal_schedule' in q['sql']])
+
+        # Permissions are checked against the cached plan
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='doctor')
+        self.assertEqual(res.status_code, 401)
+
+        # Marking a task as done invalidates the cached plan
+        body = {
+            "patient_task_schedule_id": PatientTaskSchedule.objects.filter(prehab_id=1).first().id,
+            "completed": True,
+            "difficulties": False
+        }
+        res = self.http_request('put', '/api/patient/schedule/task/done', body, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['statistics']['activities_done'], 1)
+
+        # And so does canceling it
+        res = self.http_request('put', self.prehab_path_url + 'cancel/1/', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.json()['data']['status_id'], Prehab.CANCEL)
+
+    def test_retrieve_prehab_changed_by_another_process(self):
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        # Changes made elsewhere (cron commands, other web workers) don't go through this process' cache
+        Prehab.objects.filter(pk=1).update(status=Prehab.ONGOING, change_seq=F('change_seq') + 1)
+
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.json()['data']['status_id'], Prehab.ONGOING)
+
+    def test_retrieve_prehab_people_changed(self):
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        # The patient and doctors are not part of the plan version, but are never served stale
+        Patient.objects.filter(pk=3).update(patient_tag='NEW-TAG')
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.json()['data']['patient']['patient_tag'], 'NEW-TAG')
+        etag = res['ETag']
+
+        doctor_name = res.json()['data']['doctors'][0]['name']
+        User.objects.filter(pk=res.json()['data']['doctors'][0]['id']).update(name=doctor_name + ' Jr.')
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['doctors'][0]['name'], doctor_name + ' Jr.')
+
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': res['ETag']})
+        self.assertEqual(res.status_code, 304)
+
+    def test_retrieve_prehab_not_modified(self):
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        # Same version -> 304 without a body
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+        # Dates can't tell versions apart: If-Modified-Since alone never gives a 304
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_MODIFIED_SINCE': 'Sat, 01 Jan 2050 00:00:00 GMT'})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('Last-Modified', res)
+
+        # Still no access to other plans
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='doctor',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 401)
+
+        # A change gives a new version
+        res = self.http_request('put', '/api/patient/schedule/seen/bulk/', {"prehab_id": 1}, auth_user='doctor')
+        self.assertEqual(res.status_code, 200)
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+
+        # So does a change of the statistics only, made by any process
+        etag = res['ETag']
+        PrehabStatistics.objects.filter(prehab_id=1).update(alerts_unseen=5)
+        res = self.http_request('get', self.prehab_path_url + '1', auth_user='patient',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_prehabs_not_modified(self):
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 304)
+
+        PrehabStatistics.objects.filter(prehab_id=1).update(done=1)
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        Patient.objects.filter(pk=3).update(patient_tag='NEW-TAG')
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        etag = res['ETag']
+
+        res = self.http_request('put', self.prehab_path_url + 'cancel/1/', auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin',
+                                custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+
+    def test_sync_prehab(self):
+        sync_url = self.prehab_path_url + '1/sync/'
+        number_of_tasks = PatientTaskSchedule.objects.filter(prehab_id=1).count()
+
+        # Without a token -> the whole plan
+        res = self.http_request('get', sync_url, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()['data']['tasks']), number_of_tasks)
+        self.assertGreater(len(res.json()['data']['meals']), 0)
+        token = res.json()['data']['token']
+
+        # Nothing changed
+        res = self.http_request('get', sync_url + '?token={}'.format(token), auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['tasks'], [])
+        self.assertEqual(res.json()['data']['meals'], [])
+        self.assertEqual(res.json()['data']['token'], token)
+
+        # Only the task marked as done
+        patient_task = PatientTaskSchedule.objects.filter(prehab_id=1).first()
+        body = {
+            "patient_task_schedule_id": patient_task.id,
+            "completed": True,
+            "difficulties": False
+        }
+        res = self.http_request('put', '/api/patient/schedule/task/done', body, auth_user='patient')
+        self.assertEqual(res.status_code, 200)
+
+        res = self.http_request('get', sync_url + '?token={}'.format(token), auth_user='patient')
+        self.assertEqual([t['id'] for t in res.json()['data']['tasks']], [patient_task.id])
+        self.assertEqual(res.json()['data']['tasks'][0]['status'], PatientTaskSchedule.COMPLETED)
+        self.assertGreater(res.json()['data']['token'], token)
+        token = res.json()['data']['token']
+
+        # Bulk updates are synced too
+        res = self.http_request('put', '/api/patient/schedule/seen/bulk/', {"prehab_id": 1}, auth_user='doctor')
+        self.assertEqual(res.status_code, 200)
+        res = self.http_request('get', sync_url + '?token={}'.format(token), auth_user='patient')
+        self.assertEqual(len(res.json()['data']['tasks']), number_of_tasks)
+
+        res = self.http_request('get', sync_url + '?token=x', auth_user='patient')
+        self.assertEqual(res.status_code, 400)
+        res = self.http_request('get', sync_url, auth_user='doctor')
+        self.assertEqual(res.status_code, 401)
+
+    def test_create_prehab_meal_seed(self):
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1,
+            "meal_seed": 42
+        }
+        meal_plans = []
+        for _ in range(2):
+            Prehab.objects.filter(patient_id=3).delete()
+            res = self.http_request('post', self.prehab_path_url, body, auth_user='admin')
+            self.assertEqual(res.status_code, 201)
+            prehab = Prehab.objects.get(patient_id=3)
+            self.assertEqual(prehab.meal_seed, 42)
+            meal_plans.append(list(PatientMealSchedule.objects.filter(prehab=prehab).order_by(
+                'week_number', 'day_number', 'meal_order').values_list('week_number', 'day_number', 'meal_order',
+                                                                       'meal_id')))
+        self.assertEqual(meal_plans[0], meal_plans[1])
+
+        # Without a seed one is drawn and kept
+        del body['meal_seed']
+        Prehab.objects.filter(patient_id=3).delete()
+        self.assertEqual(self.http_request('post', self.prehab_path_url, body, auth_user='admin').status_code, 201)
+        self.assertIsNotNone(Prehab.objects.get(patient_id=3).meal_seed)
+
+    def test_create_prehab_async(self):
+        Prehab.objects.filter(patient_id=3).delete()
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        res = self.http_request('post', self.prehab_path_url + '?async', body, auth_user='admin')
+        self.assertEqual(res.status_code, 202)
+        prehab_id, job_id = res.json()['details']['prehab_id'], res.json()['details']['job_id']
+        self.assertEqual(PatientTaskSchedule.objects.filter(prehab_id=prehab_id).count(), 0)
+
+        job_url = self.prehab_path_url + 'job/{}'.format(job_id)
+        res = self.http_request('get', job_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['data']['status_id'], PlanJob.QUEUED)
+        self.assertEqual(self.http_request('get', job_url, auth_user='patient').status_code, 401)
+        self.assertEqual(self.http_request('get', self.prehab_path_url + 'job/0', auth_user='admin').status_code, 404)
+
+        call_command('run_plan_jobs', '--once', stdout=mock.MagicMock())
+
+        res = self.http_request('get', job_url, auth_user='admin')
+        self.assertEqual(res.json()['data']['status'], 'Done')
+        self.assertEqual(res.json()['data']['attempts'], 1)
+        number_of_tasks = PatientTaskSchedule.objects.filter(prehab_id=prehab_id).count()
+        self.assertGreater(number_of_tasks, 0)
+        self.assertEqual(PrehabStatistics.objects.get(prehab_id=prehab_id).total, number_of_tasks)
+        self.assertEqual(PatientMealSchedule.objects.filter(prehab_id=prehab_id).count(), 2 * 7 * 5)
+        self.assertIsNone(PlanJob.objects.claim())
+
+    def test_read_prehab_while_plan_job_queued(self):
+        Prehab.objects.filter(patient_id=3).delete()
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        res = self.http_request('post', self.prehab_path_url + '?async=true', body, auth_user='admin')
+        self.assertEqual(res.status_code, 202)
+        prehab_id, job_id = res.json()['details']['prehab_id'], res.json()['details']['job_id']
+
+        # Reading the prehab before the job runs builds (and caches) an empty plan and its statistics row
+        prehab_url = self.prehab_path_url + '{}'.format(prehab_id)
+        res = self.http_request('get', prehab_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sum(len(tasks) for tasks in res.json()['data']['task_schedule'].values()), 0)
+        etag = res['ETag']
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin')
+        self.assertEqual(res.status_code, 200)
+        list_etag = res['ETag']
+
+        call_command('run_plan_jobs', '--once', stdout=mock.MagicMock())
+
+        self.assertEqual(PlanJob.objects.get(pk=job_id).status, PlanJob.DONE)
+        number_of_tasks = PatientTaskSchedule.objects.filter(prehab_id=prehab_id).count()
+        self.assertGreater(number_of_tasks, 0)
+        self.assertEqual(PrehabStatistics.objects.get(prehab_id=prehab_id).total, number_of_tasks)
+
+        res = self.http_request('get', prehab_url, auth_user='admin', custom_headers={'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(sum(len(tasks) for tasks in res.json()['data']['task_schedule'].values()), number_of_tasks)
+        res = self.http_request('get', self.prehab_path_url, auth_user='admin',
+                                custom_headers={'HTTP_IF_NONE_MATCH': list_etag})
+        self.assertEqual(res.status_code, 200)
+
+    def test_plan_job_claimed_again(self):
+        Prehab.objects.filter(patient_id=3).delete()
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        res = self.http_request('post', self.prehab_path_url + '?async', body, auth_user='admin')
+        job = PlanJob.objects.claim()
+        self.assertEqual(job.id, res.json()['details']['job_id'])
+
+        # The first worker is slow, not dead: the job is claimed again after PLAN_JOB_TIMEOUT
+        with self.settings(PLAN_JOB_TIMEOUT=-1):
+            job_again = PlanJob.objects.claim()
+        self.assertEqual(job_again.id, job.id)
+
+        PlanBuilder.run_job(job)
+        number_of_tasks = PatientTaskSchedule.objects.filter(prehab_id=job.prehab_id).count()
+        number_of_meals = PatientMealSchedule.objects.filter(prehab_id=job.prehab_id).count()
+        PlanBuilder.run_job(job_again)
+
+        self.assertEqual(PlanJob.objects.get(pk=job.id).status, PlanJob.DONE)
+        self.assertEqual(PatientTaskSchedule.objects.filter(prehab_id=job.prehab_id).count(), number_of_tasks)
+        self.assertEqual(PatientMealSchedule.objects.filter(prehab_id=job.prehab_id).count(), number_of_meals)
+        self.assertEqual(PrehabStatistics.objects.get(prehab_id=job.prehab_id).total, number_of_tasks)
+
+    def test_create_prehab_async_flag(self):
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        for query, status_code in (('?async', 202), ('?async=1', 202), ('?async=True', 202),
+                                   ('?async=0', 201), ('?async=false', 201)):
+            Prehab.objects.filter(patient_id=3).delete()
+            res = self.http_request('post', self.prehab_path_url + query, body, auth_user='admin')
+            self.assertEqual(res.status_code, status_code, query)
+
+    def test_create_prehab_async_without_meals(self):
+        Prehab.objects.filter(patient_id=3).delete()
+        for constraint_type_id in range(1, 6):
+            PatientConstraintType.objects.create(patient_id=3, constraint_type_id=constraint_type_id)
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        # Refused before any job is queued, like the synchronous creation
+        res = self.http_request('post', self.prehab_path_url + '?async', body, auth_user='admin')
+        self.assertEqual(res.status_code, 401)
+        self.assertIn('Number of meals for this type of patient is zero', res.json()['details'])
+        self.assertFalse(Prehab.objects.filter(patient_id=3).exists())
+        self.assertFalse(PlanJob.objects.exists())
+
+    def test_failed_plan_job(self):
+        Prehab.objects.filter(patient_id=3).delete()
+        body = {
+            "patient_id": 3,
+            "init_date": "22-05-2018",
+            "surgery_date": "06-06-2018",
+            "task_schedule_id": 1
+        }
+        res = self.http_request('post', self.prehab_path_url + '?async', body, auth_user='admin')
+        self.assertEqual(res.status_code, 202)
+        job_id = res.json()['details']['job_id']
+
+        with mock.patch('prehab.helpers.PlanBuilder.BulkWriter.insert', side_effect=RuntimeError('database is gone')):
+            call_command('run_plan_jobs', '--once', stdout=mock.MagicMock())
+
+        job = PlanJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, PlanJob.FAILED)
+        self.assertEqual(job.error, 'RuntimeError: database is gone')
+        self.assertEqual(PatientTaskSchedule.objects.filter(prehab_id=job.prehab_id).count(), 0)
+
+        # Not run again on its own
+        call_command('run_plan_jobs', '--once', stdout=mock.MagicMock())
+        self.assertEqual(PlanJob.objects.get(pk=job_id).status, PlanJob.FAILED)
+
+        call_command('run_plan_jobs', '--once', '--retry-failed', stdout=mock.MagicMock())
+
+        job = PlanJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, PlanJob.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.error)
+        self.assertGreater(PatientTaskSchedule.objects.filter(prehab_id=job.prehab_id).count(), 0)
@@ -1,3 +1,7 @@
+from django.core.cache import caches
+from django.test import override_settings
+
+from prehab.pagination import PageSizePagination
 from prehab_app.models.Task import Task
 from prehab_app.tests.TestSuit import TestSuit
 
@@ -77,3 +81,38 @@ class AuthViewTests(TestSuit):
     #     self.assertEqual(response.json()['data']['task_type'], task.task_type)
     #     self.assertEqual(response.json()['data']['description'], task.description)
     #     self.assertEqual(response.json()['data']['multimedia_link'], task.multimedia_link)
+
+    def test_task_list_pages(self):
+        res = self.http_request('get', self.url_path + '?page_size=2&page=2')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()['data']), 2)
+        self.assertEqual(res.json()['count'], Task.objects.count())
+        self.assertEqual(res.json()['page'], 2)
+        self.assertEqual(res.json()['page_size'], 2)
+        self.assertIn('page_size=2', res.json()['previous'])
+
+        # The page size has a maximum
+        res = self.http_request('get', self.url_path + '?page_size=100000')
+        self.assertEqual(res.json()['page_size'], PageSizePagination.max_page_size)
+
+    @override_settings(APPROXIMATE_COUNT_THRESHOLD=5)
+    def test_task_list_approximate_count(self):
+        self.addCleanup(caches['default'].clear)
+        number_of_tasks = Task.objects.count()
+
+        # The first count is exact, and then reused
+        res = self.http_request('get', self.url_path + '?page_size=5')
+        self.assertEqual(res.json()['count'], number_of_tasks)
+        self.assertFalse(res.json()['count_is_approximate'])
+
+        Task.objects.create(title='New Task', task_type=1, description='', multimedia_link='')
+        res = self.http_request('get', self.url_path + '?page_size=5')
+        self.assertEqual(res.json()['count'], number_of_tasks)
+        self.assertTrue(res.json()['count_is_approximate'])
+
+        # Pages after the approximate count can still be read
+        res = self.http_request('get', self.url_path + '?page_size=5&page=2')
+        self.assertEqual(len(res.json()['data']), number_of_tasks + 1 - 5)
+        self.assertIsNone(res.json()['next'])
+        res = self.http_request('get', self.url_path + '?page_size=5&page=3')
+        self.assertEqual(res.status_code, 400)
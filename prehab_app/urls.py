@@ -30,6 +30,7 @@ urlpatterns = [
     url(r'login/', AuthViewSet.as_view({'post': 'login'}), name='login'),
     url(r'logout/', AuthViewSet.as_view({'post': 'logout'}), name='logout'),
     url(r'patient/schedule/task/done', PatientTaskScheduleViewSet.as_view({'put': 'mark_as_done'}), name='updateTaskSchedule'),
+    url(r'patient/schedule/task/export', PatientTaskScheduleViewSet.as_view({'get': 'export'}), name='export_adherence'),
     url(r'patient/schedule/seen/bulk', PatientTaskScheduleViewSet.as_view({'put': 'seen_in_bulk'}), name='seen_in_bulk'),
     url(r'patient/(?P<pk>\d+)/statistics', PatientViewSet.as_view({'get': 'statistics'}), name='getStatistics'),
     url(r'patient/add_second_doctor', PatientViewSet.as_view({'post': 'add_second_doctor'}), name='add_second_doctor'),
@@ -38,6 +39,8 @@ urlpatterns = [
     url(r'cron/prehabs', CronJobsViewSet.as_view({'post': 'clean_prehabs'}), name='clean_prehabs'),
 
     url(r'prehab/cancel/(?P<pk>\d+)/', PrehabViewSet.as_view({'put': 'cancel'}), name='cancel_prehab'),
+    url(r'prehab/(?P<pk>\d+)/sync', PrehabViewSet.as_view({'get': 'sync'}), name='sync_prehab'),
+    url(r'prehab/job/(?P<pk>\d+)', PrehabViewSet.as_view({'get': 'job_status'}), name='prehab_job_status'),
 
     path('', include(router.urls)),
 ]
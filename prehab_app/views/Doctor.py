@@ -21,8 +21,7 @@ class DoctorViewSet(GenericViewSet):
             if request.ROLE_ID == 3:
                 raise HttpException(401, 'Não tem permissões para aceder a este recurso.', 'You don\'t have access to this resource.')
 
-            doctors = self.paginate_queryset(Doctor.objects.all())
-            queryset = self.paginate_queryset(doctors)
+            queryset = self.paginate_queryset(Doctor.objects.all())
 
         except HttpException as e:
             return HTTP.response(e.http_code, e.http_custom_message, e.http_detail)
@@ -5,7 +5,7 @@ from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
 from prehab.helpers.SchemaValidator import SchemaValidator
 from prehab.permissions import Permission
-from prehab_app.models import TaskSchedule, WeekTaskSchedule, Task, User
+from prehab_app.models import TaskSchedule, WeekTaskSchedule, Task
 from prehab_app.serializers.TaskSchedule import FullTaskScheduleSerializer
 
 
@@ -62,7 +62,7 @@ class FullTaskScheduleViewSet(GenericViewSet):
                 task_schedule = TaskSchedule(
                     title=request.data['title'],
                     number_of_weeks=request.data['number_of_weeks'],
-                    created_by=User.objects.get(pk=request.USER_ID),
+                    created_by_id=request.USER_ID,
                     is_active=True
                 )
 
@@ -1,8 +1,10 @@
 from django.db import transaction
 from rest_framework.viewsets import GenericViewSet
 
+from prehab.helpers.CatalogCache import CatalogCache
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
+from prehab.helpers.MealIndex import MealIndex
 from prehab.helpers.SchemaValidator import SchemaValidator
 from prehab_app.models import ConstraintType
 from prehab_app.models.Meal import Meal
@@ -77,6 +79,9 @@ class MealViewSet(GenericViewSet):
                     )
                     meal_constraint_type.save()
 
+            CatalogCache.invalidate()
+            MealIndex.invalidate()
+
         except ConstraintType.DoesNotExist:
             return HTTP.response(404, 'Restrição alimentar not found.', 'Constraint not found.')
         except HttpException as e:
@@ -2,14 +2,15 @@ import random
 import string
 from datetime import datetime
 
-import math
 from rest_framework.viewsets import GenericViewSet
 
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
+from prehab.helpers.PrehabCache import PrehabCache
 from prehab.helpers.SchemaValidator import SchemaValidator
+from prehab.pagination import PageOrCursorPagination
 from prehab.permissions import Permission
-from prehab_app.models import ConstraintType, PatientConstraintType, Doctor, Role, User, Prehab, PatientTaskSchedule
+from prehab_app.models import ConstraintType, PatientConstraintType, Doctor, Role, User, Prehab, PrehabStatistics
 from prehab_app.models.DoctorPatient import DoctorPatient
 from prehab_app.models.Patient import Patient
 from prehab_app.serializers.ConstraintType import ConstraintTypeSerializer
@@ -18,6 +19,7 @@ from prehab_app.serializers.Patient import PatientSerializer
 
 
 class PatientViewSet(GenericViewSet):
+    pagination_class = PageOrCursorPagination
 
     def list(self, request):
         try:
@@ -124,7 +126,6 @@ class PatientViewSet(GenericViewSet):
             patient_tag = "HSJ{}{}".format(datetime.now().year, str(new_user.id).zfill(4))
             new_user.username = patient_tag
             new_user.save()
-            doctor = Doctor.objects.get(pk=request.USER_ID)
 
             # 3. Add new Patient
             new_patient = Patient(
@@ -140,7 +141,7 @@ class PatientViewSet(GenericViewSet):
             # 4. Create Doctor Patient Association
             relation = DoctorPatient(
                 patient=new_patient,
-                doctor=doctor
+                doctor_id=request.USER_ID
             )
 
             relation.save()
@@ -190,17 +191,13 @@ class PatientViewSet(GenericViewSet):
 
             prehab = Prehab.objects.filter(patient=patient).first()
 
-            if prehab is not None:
+            if prehab is None:
                 raise HttpException(400, 'Paciente não tem Prehabs associados',
                                     'Patient needs a prehab to retrieve statistics.')
 
-            patient_tasks = PatientTaskSchedule.objects.filter(prehab=prehab).all()
+            prehab_statistics = PrehabStatistics.objects.for_prehabs([prehab])[prehab.id]
 
             days_to_surgery = (datetime.now().date() - prehab.surgery_date).days
-            current_week_num = math.floor(days_to_surgery / 7)
-            current_day_num = days_to_surgery - 7 * current_week_num
-            pass_patient_tasks = [t for t in patient_tasks if
-                                  t.week_number <= current_week_num and t.day_number <= current_day_num]
 
             data = {
                 'patient_id': pk,
@@ -209,12 +206,7 @@ class PatientViewSet(GenericViewSet):
                 'prehab_expected_end_date': prehab.expected_end_date,
                 'surgery_day': prehab.surgery_date,
                 'days_until_surgery': days_to_surgery if days_to_surgery > 0 else None,
-                'total_activities': len(patient_tasks),
-                'total_activities_until_now': len(pass_patient_tasks),
-                'activities_done': len([t for t in pass_patient_tasks if t.status == PatientTaskSchedule.COMPLETED]),
-                'activities_with_difficulty': len([t for t in pass_patient_tasks if t.was_difficult]),
-                'activities_not_done': len(
-                    [t for t in pass_patient_tasks if t.status == PatientTaskSchedule.NOT_COMPLETED]),
+                **prehab_statistics.get_activities_info(),
                 'prehab_status_id': prehab.status,
                 'prehab_status': prehab.get_status_display()
             }
@@ -272,6 +264,9 @@ class PatientViewSet(GenericViewSet):
 
             new_relation.save()
 
+            # Cached plans list the patient doctors
+            PrehabCache.bump(*Prehab.objects.filter(patient=patient).values_list('id', flat=True))
+
         except Doctor.DoesNotExist as e:
             return HTTP.response(404, 'Médico não encontrado', 'Doctor with id {} not found. {}'.format(
                 data['doctor_id'], str(e)))
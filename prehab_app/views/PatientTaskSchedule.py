@@ -1,21 +1,29 @@
 import datetime
 
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework.viewsets import GenericViewSet
 
+from prehab.helpers.AdherenceExport import AdherenceExport
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
+from prehab.helpers.PrehabCache import PrehabCache
+from prehab.helpers.RowVersion import RowVersion
 from prehab.helpers.SchemaValidator import SchemaValidator
+from prehab.pagination import PageOrCursorPagination
 from prehab.permissions import Permission
 from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
 from prehab_app.models.Prehab import Prehab
+from prehab_app.models.PrehabStatistics import PrehabStatistics
 from prehab_app.serializers.PatientTaskSchedule import SimplePatientTaskScheduleSerializer
 
 
 class PatientTaskScheduleViewSet(GenericViewSet):
+    pagination_class = PageOrCursorPagination
 
     def list(self, request):
         """
-        Query Parameters: patient_id
+        Query Parameters: patient_id, stream (all the rows, encoded while they are read, instead of a page)
         :param request:
         :return:
         """
@@ -37,6 +45,16 @@ class PatientTaskScheduleViewSet(GenericViewSet):
             else:
                 raise HttpException(400)
 
+            etag, last_modified = RowVersion.of_queryset('patient-tasks', patient_task_schedule,
+                                                         request.ROLE_ID, request.USER_ID, request.GET.urlencode())
+            not_modified = HTTP.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            if 'stream' in request.GET:
+                return HTTP.stream(200, patient_task_schedule.order_by('id'), SimplePatientTaskScheduleSerializer,
+                                   etag=etag, last_modified=last_modified)
+
             queryset = self.paginate_queryset(patient_task_schedule)
             data = SimplePatientTaskScheduleSerializer(queryset, many=True).data
 
@@ -47,24 +65,64 @@ class PatientTaskScheduleViewSet(GenericViewSet):
                                  'Ocorreu um erro inesperado',
                                  'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, '', data=data, paginator=self.paginator)
+        return HTTP.response(200, '', data=data, paginator=self.paginator, etag=etag, last_modified=last_modified)
+
+    @staticmethod
+    def export(request):
+        """
+        Query Parameters: type (csv or ndjson), doctor_id, date_from, date_to (dd-mm-yyyy), status
+        Adherence data of the patient tasks, streamed as a file (see AdherenceExport).
+        """
+        try:
+            if not Permission.verify(request, ['Admin', 'Doctor']):
+                raise HttpException(401,
+                                    'Não tem permissões para aceder a este recurso.',
+                                    'You don\'t have access to this resource.')
+
+            export_type = request.GET.get('type', 'csv')
+            filters = AdherenceExport.parse_filters(request.GET)
+            # Doctors only export their own prehabs, patients nothing
+            if request.ROLE_ID == 2:
+                filters['doctor_id'] = request.USER_ID
+            elif request.ROLE_ID != 1:
+                raise HttpException(401,
+                                    'Não tem permissões para aceder a este recurso.',
+                                    'You don\'t have access to this resource.')
+
+            lines = AdherenceExport.lines(export_type, AdherenceExport.queryset(**filters))
+
+        except HttpException as e:
+            return HTTP.response(e.http_code, e.http_custom_message, e.http_detail)
+        except Exception as e:
+            return HTTP.response(400,
+                                 'Ocorreu um erro inesperado',
+                                 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
+
+        res = StreamingHttpResponse(lines, content_type=AdherenceExport.CONTENT_TYPES[export_type])
+        res['Content-Disposition'] = 'attachment; filename="adherence.{}"'.format(export_type)
+        return res
 
     @staticmethod
     def retrieve(request, pk=None):
         try:
-            patient_task_schedule = PatientTaskSchedule.objects.get(pk=pk)
+            patient_task_schedule = PatientTaskSchedule.objects.select_related('prehab').get(pk=pk)
 
             # In case it's a Doctor -> check if he/she has permission
-            if request.ROLE_ID == 2 and request.USER_ID != patient_task_schedule.prehab.created_by.user.id:
+            if request.IDENTITY.is_doctor and request.USER_ID != patient_task_schedule.prehab.created_by_id:
                 raise HttpException(401,
                                     'Não tem permissões para aceder a este recurso.',
                                     'You don\'t have access to this resource.')
             # In case it's a Patient -> check if it's own information
-            elif request.ROLE_ID == 3 and request.USER_ID != patient_task_schedule.prehab.patient.user.id:
+            elif request.IDENTITY.is_patient and request.USER_ID != patient_task_schedule.prehab.patient_id:
                 raise HttpException(401,
                                     'Não tem permissões para aceder a este recurso.',
                                     'You don\'t have access to this resource.')
 
+            etag, last_modified = RowVersion.of_row('patient-task', patient_task_schedule)
+            not_modified = HTTP.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
             data = SimplePatientTaskScheduleSerializer(patient_task_schedule, many=False).data
 
         except PatientTaskSchedule.DoesNotExist:
@@ -78,7 +136,7 @@ class PatientTaskScheduleViewSet(GenericViewSet):
                                  'Ocorreu um erro inesperado',
                                  'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, data=data)
+        return HTTP.response(200, data=data, etag=etag, last_modified=last_modified)
 
     @staticmethod
     def create(request):
@@ -103,23 +161,33 @@ class PatientTaskScheduleViewSet(GenericViewSet):
             # 1.2. Check schema
             SchemaValidator.validate_obj_structure(data, 'patient_task_schedule/mark_as_seen.json')
 
-            # 1.3. Check if Patient Task Schedule is valid
-            patient_task_schedule = PatientTaskSchedule.objects.get(pk=data['patient_task_schedule_id'])
-            if patient_task_schedule.status > 2:
-                raise HttpException(400,
-                                    'Esta atividade já foi realizada anteriormente',
-                                    'This activity was mark as done already.')
-
-            # 1.4. Check if doctor is prehab's owner
-            if request.ROLE_ID != 2 or request.ROLE_ID == 2 and patient_task_schedule.prehab.doctor.user.id != request.USER_ID:
-                raise HttpException(400,
-                                    'Não tem permissões para editar este Prehab',
-                                    'You can\'t update this Prehab Plan')
-
-            # 2. Update This specific Task in PatientTaskSchedule
-            patient_task_schedule.seen_by_doctor = data['seen']
-            patient_task_schedule.doctor_notes = data['doctor_notes'] if 'doctor_notes' in data else ''
-            patient_task_schedule.save()
+            # The task is locked until its statistics are updated, so concurrent updates apply their deltas one at a time
+            with transaction.atomic():
+                # 1.3. Check if Patient Task Schedule is valid
+                patient_task_schedule = PatientTaskSchedule.objects.select_for_update() \
+                    .get(pk=data['patient_task_schedule_id'])
+                if patient_task_schedule.status > 2:
+                    raise HttpException(400,
+                                        'Esta atividade já foi realizada anteriormente',
+                                        'This activity was mark as done already.')
+
+                # 1.4. Check if doctor is prehab's owner
+                if not request.IDENTITY.is_doctor or patient_task_schedule.prehab.created_by_id != request.USER_ID:
+                    raise HttpException(400,
+                                        'Não tem permissões para editar este Prehab',
+                                        'You can\'t update this Prehab Plan')
+
+                # 2. Update This specific Task in PatientTaskSchedule
+                counters_before = PrehabStatistics.counters_of(patient_task_schedule)
+                patient_task_schedule.seen_by_doctor = data['seen']
+                patient_task_schedule.doctor_notes = data['doctor_notes'] if 'doctor_notes' in data else ''
+                patient_task_schedule.save()
+
+                # 3. Update Prehab Statistics
+                PrehabStatistics.objects.apply_delta(
+                    patient_task_schedule.prehab_id,
+                    PrehabStatistics.delta(counters_before, PrehabStatistics.counters_of(patient_task_schedule)))
+            PrehabCache.bump(patient_task_schedule.prehab_id)
 
         except PatientTaskSchedule.DoesNotExist:
             return HTTP.response(404,
@@ -150,11 +218,12 @@ class PatientTaskScheduleViewSet(GenericViewSet):
             # 1.2. Check schema
             SchemaValidator.validate_obj_structure(data, 'patient_task_schedule/mark_as_seen_bulk.json')
 
-            # 1.3. Check if Patient Task Schedule is valid
-            patient_tasks = PatientTaskSchedule.objects.filter(prehab=data['prehab_id']).all()
-            for patient_task in patient_tasks:
-                patient_task.seen_by_doctor = True
-                patient_task.save()
+            # 2. Mark every task of the prehab as seen
+            PatientTaskSchedule.objects.filter(prehab=data['prehab_id']).update_changed(seen_by_doctor=True)
+
+            # 3. Update Prehab Statistics
+            PrehabStatistics.objects.filter(prehab_id=data['prehab_id']).update(alerts_unseen=0)
+            PrehabCache.bump(data['prehab_id'])
 
         except PatientTaskSchedule.DoesNotExist:
             return HTTP.response(404,
@@ -184,35 +253,46 @@ class PatientTaskScheduleViewSet(GenericViewSet):
             # 1.2. Check schema
             SchemaValidator.validate_obj_structure(data, 'patient_task_schedule/mark_as_done.json')
 
-            # 1.3. Check if Patient Task Schedule is valid
-            patient_task_schedule = PatientTaskSchedule.objects.get(pk=data['patient_task_schedule_id'])
-            if patient_task_schedule.status > 2:
-                raise HttpException(400, 'Esta atividade já tinha sido realizada.',
-                                    'This activity was mark as done already.')
-
-            # 1.4. Check if patient is prehab's owner
-            if patient_task_schedule.prehab.patient.user.id != request.USER_ID:
-                raise HttpException(400, 'Não pode atualizar este prehab.', 'You can\'t update this Prehab Plan')
-
-            # 2. Update This specific Task in PatientTaskSchedule
-            # 2.1. Task completed with success
-            if data['completed']:
-                patient_task_schedule.status = PatientTaskSchedule.COMPLETED
-
-            # 2.2. Task not completed
-            else:
-                patient_task_schedule.status = PatientTaskSchedule.NOT_COMPLETED
-
-            patient_task_schedule.finished_date = datetime.datetime.now()
-            patient_task_schedule.save()
-
-            # 3. Report Difficulties
-            patient_task_schedule.was_difficult = data['difficulties']
-            patient_task_schedule.patient_notes = data['notes'] if 'notes' in data else ''
-
-            # Doctor only need to check activities that the patient had difficult
-            patient_task_schedule.seen_by_doctor = False if data['difficulties'] else True
-            patient_task_schedule.save()
+            # The task is locked until its statistics are updated, so concurrent updates apply their deltas one at a time
+            with transaction.atomic():
+                # 1.3. Check if Patient Task Schedule is valid
+                patient_task_schedule = PatientTaskSchedule.objects.select_for_update() \
+                    .get(pk=data['patient_task_schedule_id'])
+                if patient_task_schedule.status > 2:
+                    raise HttpException(400, 'Esta atividade já tinha sido realizada.',
+                                        'This activity was mark as done already.')
+
+                # 1.4. Check if patient is prehab's owner
+                if patient_task_schedule.prehab.patient_id != request.USER_ID:
+                    raise HttpException(400, 'Não pode atualizar este prehab.', 'You can\'t update this Prehab Plan')
+
+                # 2. Update This specific Task in PatientTaskSchedule
+                counters_before = PrehabStatistics.counters_of(patient_task_schedule)
+
+                # 2.1. Task completed with success
+                if data['completed']:
+                    patient_task_schedule.status = PatientTaskSchedule.COMPLETED
+
+                # 2.2. Task not completed
+                else:
+                    patient_task_schedule.status = PatientTaskSchedule.NOT_COMPLETED
+
+                patient_task_schedule.finished_date = datetime.datetime.now()
+                patient_task_schedule.save()
+
+                # 3. Report Difficulties
+                patient_task_schedule.was_difficult = data['difficulties']
+                patient_task_schedule.patient_notes = data['notes'] if 'notes' in data else ''
+
+                # Doctor only need to check activities that the patient had difficult
+                patient_task_schedule.seen_by_doctor = False if data['difficulties'] else True
+                patient_task_schedule.save()
+
+                # 4. Update Prehab Statistics
+                PrehabStatistics.objects.apply_delta(
+                    patient_task_schedule.prehab_id,
+                    PrehabStatistics.delta(counters_before, PrehabStatistics.counters_of(patient_task_schedule)))
+            PrehabCache.bump(patient_task_schedule.prehab_id)
 
         except PatientTaskSchedule.DoesNotExist as e:
             return HTTP.response(404, 'Tarefa do paciente não encontrada.', 'Patient Task Schedule not found.')
@@ -1,27 +1,37 @@
 import datetime
+import random
 
 from django.db import transaction
+from django.db.models import F
 from rest_framework.viewsets import GenericViewSet
 
 from prehab.helpers.DataHelper import DataHelper
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
+from prehab.helpers.PlanBuilder import PlanBuilder
+from prehab.helpers.PrehabCache import PrehabCache
+from prehab.helpers.RowVersion import RowVersion
 from prehab.helpers.SchemaValidator import SchemaValidator
+from prehab.pagination import PageOrCursorPagination
 from prehab.permissions import Permission
-from prehab_app.models.Doctor import Doctor
 from prehab_app.models.DoctorPatient import DoctorPatient
 from prehab_app.models.Patient import Patient
 from prehab_app.models.PatientConstraintType import PatientConstraintType
 from prehab_app.models.PatientMealSchedule import PatientMealSchedule
 from prehab_app.models.PatientTaskSchedule import PatientTaskSchedule
+from prehab_app.models.PlanJob import PlanJob
 from prehab_app.models.Prehab import Prehab
+from prehab_app.models.PrehabStatistics import PrehabStatistics
 from prehab_app.models.TaskSchedule import TaskSchedule
 from prehab_app.serializers.Doctor import SimpleDoctorSerializer
 from prehab_app.serializers.Patient import PatientWithConstraintsSerializer
+from prehab_app.serializers.PatientMealSchedule import SimplePatientMealScheduleSerializer
+from prehab_app.serializers.PatientTaskSchedule import SimplePatientTaskScheduleSerializer
 from prehab_app.serializers.Prehab import PrehabSerializer, FullPrehabSerializer
 
 
 class PrehabViewSet(GenericViewSet):
+    pagination_class = PageOrCursorPagination
 
     def list(self, request):
         try:
@@ -42,16 +52,28 @@ class PrehabViewSet(GenericViewSet):
             else:
                 raise HttpException(400)
 
-            queryset = self.paginate_queryset(prehabs)
-            data = PrehabSerializer(queryset, many=True).data
-            for record in data:
-                # STATISTICS
-                prehab = Prehab.objects.get(pk=record['id'])
-                patient_tasks = PatientTaskSchedule.objects.filter(prehab=prehab).all()
+            queryset = self.paginate_queryset(prehabs.select_related('patient'))
+
+            # STATISTICS - one row per prehab
+            statistics = PrehabStatistics.objects.for_prehabs(queryset)
 
-                past_patient_tasks = [t for t in patient_tasks if
-                                      t.week_number <= prehab.get_current_week_num() and t.day_number <= prehab.get_current_day_num()]
+            # The page changes with the versions of its plans (see PrehabCache), the patient tags and the days until
+            # surgery
+            etag = 'prehabs-' + RowVersion.digest([
+                request.ROLE_ID, request.USER_ID, request.GET.urlencode(), str(datetime.date.today()),
+                self.paginator.pagination_info(),
+                *[(PrehabCache.etag(prehab.id, PrehabCache.version_of(prehab, statistics[prehab.id])),
+                   prehab.patient.patient_tag)
+                  for prehab in queryset]
+            ])
+            not_modified = HTTP.not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+
+            data = PrehabSerializer(queryset, many=True).data
 
+            for prehab, record in zip(queryset, data):
+                prehab_statistics = statistics[prehab.id]
                 record['info'] = {
                     'patient_id': prehab.patient.pk,
                     'patient_tag': prehab.patient.patient_tag,
@@ -60,19 +82,11 @@ class PrehabViewSet(GenericViewSet):
                     'prehab_expected_end_date': prehab.expected_end_date,
                     'surgery_day': prehab.surgery_date,
                     'days_until_surgery': prehab.get_days_to_prehab_end() if prehab.get_days_to_prehab_end() else None,
-                    'total_activities': len(patient_tasks),
-                    'total_activities_until_now': len(past_patient_tasks),
-                    'activities_done': len(
-                        [t for t in past_patient_tasks if t.status == PatientTaskSchedule.COMPLETED]),
-                    'activities_with_difficulty': len([t for t in past_patient_tasks if t.was_difficult]),
-                    'activities_not_done': len(
-                        [t for t in past_patient_tasks if t.status == PatientTaskSchedule.NOT_COMPLETED]),
+                    **prehab_statistics.get_activities_info(),
                     'prehab_status_id': prehab.status,
                     'prehab_status': prehab.get_status_display(),
-                    'number_of_alerts_unseen': len([t for t in past_patient_tasks if
-                                                    (t.status == PatientTaskSchedule.NOT_COMPLETED or t.was_difficult) and not t.seen_by_doctor]),
-                    'number_of_alerts': len([t for t in past_patient_tasks if
-                                             (t.status == PatientTaskSchedule.NOT_COMPLETED or t.was_difficult)])
+                    'number_of_alerts_unseen': prehab_statistics.alerts_unseen,
+                    'number_of_alerts': prehab_statistics.alerts
                 }
 
         except HttpException as e:
@@ -82,36 +96,31 @@ class PrehabViewSet(GenericViewSet):
                                  'Ocorreu um erro inesperado',
                                  'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, '', data=data)  # , paginator=self.paginator)
+        return HTTP.response(200, '', data=data, paginator=self.paginator, etag=etag)
 
     @staticmethod
     def retrieve(request, pk=None):
         try:
-            prehab = Prehab.objects.get(pk=pk)
-            if request.ROLE_ID != 1 and request.USER_ID not in (prehab.created_by.user.id, prehab.patient.user.id):
+            # Full plans are cached until something changes them (see PrehabCache)
+            prehab_id = int(pk)
+            etag = PrehabCache.etag(prehab_id, PrehabCache.version(prehab_id))
+            cached = PrehabCache.get(etag)
+            if cached is None:
+                cached = PrehabViewSet.get_full_prehab(prehab_id)
+                PrehabCache.set(etag, cached)
+
+            if request.ROLE_ID != 1 and request.USER_ID not in cached['owners']:
                 raise HttpException(401, 'Você não tem permissões para ver este prehab.',
                                     'You don\'t have permissions to see this Prehab Plan')
 
-            # STATISTICS
-            patient_tasks = PatientTaskSchedule.objects.filter(prehab=prehab).all()
-            pass_patient_tasks = [t for t in patient_tasks if
-                                  t.week_number <= prehab.get_current_week_num() and t.day_number <= prehab.get_current_day_num()]
-
-            prehab_statistics = {
-                'total_activities': len(patient_tasks),
-                'total_activities_until_now': len(pass_patient_tasks),
-                'activities_done': len([t for t in pass_patient_tasks if t.status == PatientTaskSchedule.COMPLETED]),
-                'activities_with_difficulty': len([t for t in pass_patient_tasks if t.was_difficult]),
-                'activities_not_done': len(
-                    [t for t in pass_patient_tasks if t.status == PatientTaskSchedule.NOT_COMPLETED]),
-                'prehab_status_id': prehab.status,
-                'prehab_status': prehab.get_status_display()
-            }
+            # Patient and doctors change without the plan: they are not cached, but loaded and versioned every time
+            people = PrehabViewSet.get_prehab_people(cached['owners'][1])
+            etag = '{}-{}'.format(etag, RowVersion.digest(people))
 
-            # DOCTORS
-            prehab_doctors = []
-            for doctor_patient in DoctorPatient.objects.filter(patient=prehab.patient).all():
-                prehab_doctors.append(SimpleDoctorSerializer(doctor_patient.doctor, many=False).data)
+            # The client has this version already
+            not_modified = HTTP.not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
 
         except Prehab.DoesNotExist:
             return HTTP.response(404, 'Prehab não encontrado', 'Prehab with id {} does not exist'.format(str(pk)))
@@ -123,6 +132,23 @@ class PrehabViewSet(GenericViewSet):
             return HTTP.response(400, 'Ocorreu um erro inesperado',
                                  'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
+        return HTTP.response(200, data={**cached['data'], **people}, etag=etag)
+
+    @staticmethod
+    def get_full_prehab(prehab_id):
+        """
+        Full prehab plan, as cached by retrieve: the response data and the ids of the users that can see it (the
+        creator and the patient). The patient and doctors are left to get_prehab_people.
+        """
+        prehab = FullPrehabSerializer.setup_eager_loading(Prehab.objects).get(pk=prehab_id)
+
+        # STATISTICS
+        prehab_statistics = {
+            **PrehabStatistics.objects.for_prehabs([prehab])[prehab.id].get_activities_info(),
+            'prehab_status_id': prehab.status,
+            'prehab_status': prehab.get_status_display()
+        }
+
         data = FullPrehabSerializer(prehab, many=False).data
 
         data['alerts'] = [
@@ -145,12 +171,69 @@ class PrehabViewSet(GenericViewSet):
         data['number_of_alerts'] = len(data['alerts'])
 
         data['statistics'] = prehab_statistics
-        data['patient'] = PatientWithConstraintsSerializer(prehab.patient, many=False).data
 
-        data['patient']['patient_constraints'] = [patient_constraint['constraint_type']['title']
-                                                  for patient_constraint in data['patient']['patient_constraints']]
+        return {
+            'owners': (prehab.created_by_id, prehab.patient_id),
+            'data': data
+        }
+
+    @staticmethod
+    def get_prehab_people(patient_id):
+        """ Patient (with the titles of the constraints) and doctors of a prehab, as shown by retrieve """
+        patient = Patient.objects.prefetch_related('patient_constraints__constraint_type').get(pk=patient_id)
+        patient_data = PatientWithConstraintsSerializer(patient, many=False).data
+        patient_data['patient_constraints'] = [patient_constraint['constraint_type']['title']
+                                               for patient_constraint in patient_data['patient_constraints']]
+
+        # DOCTORS
+        prehab_doctors = []
+        for doctor_patient in DoctorPatient.objects.filter(patient=patient_id).select_related('doctor__user__role'):
+            prehab_doctors.append(SimpleDoctorSerializer(doctor_patient.doctor, many=False).data)
+
+        return {
+            'patient': patient_data,
+            'doctors': prehab_doctors
+        }
+
+    @staticmethod
+    def sync(request, pk=None):
+        """
+        Query Parameters: token
+        Tasks and meals changed since the sync token (all of them without one) and the token to send next time.
+        """
+        try:
+            prehab = Prehab.objects.get(pk=pk)
+            if request.ROLE_ID != 1 and request.USER_ID not in (prehab.created_by_id, prehab.patient_id):
+                raise HttpException(401, 'Você não tem permissões para ver este prehab.',
+                                    'You don\'t have permissions to see this Prehab Plan')
+
+            token = request.GET.get('token')
+            if token is not None and not token.isdigit():
+                raise HttpException(400, 'Token de sincronização inválido.', 'Invalid sync token {}.'.format(token))
+
+            # The token is read before the rows: a change committed meanwhile is sent now or next time, never lost
+            patient_tasks = PatientTaskSchedule.objects.filter(prehab=prehab).order_by('change_seq', 'id')
+            patient_meals = PatientMealSchedule.objects.filter(prehab=prehab).order_by('change_seq', 'id')
+            # A token from the future (restored database) gets everything again
+            if token is not None and int(token) <= prehab.change_seq:
+                patient_tasks = patient_tasks.filter(change_seq__gt=int(token))
+                patient_meals = patient_meals.filter(change_seq__gt=int(token))
 
-        data['doctors'] = prehab_doctors
+            data = {
+                'token': prehab.change_seq,
+                'prehab_status_id': prehab.status,
+                'prehab_status': prehab.get_status_display(),
+                'tasks': SimplePatientTaskScheduleSerializer(patient_tasks, many=True).data,
+                'meals': SimplePatientMealScheduleSerializer(patient_meals, many=True).data
+            }
+
+        except Prehab.DoesNotExist:
+            return HTTP.response(404, 'Prehab não encontrado', 'Prehab with id {} does not exist'.format(str(pk)))
+        except HttpException as e:
+            return HTTP.response(e.http_code, e.http_custom_message, e.http_detail)
+        except Exception as e:
+            return HTTP.response(400, 'Ocorreu um erro inesperado',
+                                 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
         return HTTP.response(200, data=data)
 
@@ -172,8 +255,7 @@ class PrehabViewSet(GenericViewSet):
             # 1.3. Check if patient_id is one of this doctor patients
             patient_id = data['patient_id']
             patient = Patient.objects.get(pk=patient_id)
-            doctor = Doctor.objects.get(pk=request.USER_ID)
-            if request.ROLE_ID == 2 and not DoctorPatient.objects.is_a_match(request.USER_ID, patient_id):
+            if request.IDENTITY.is_doctor and not DoctorPatient.objects.is_a_match(request.USER_ID, patient_id):
                 raise HttpException(400,
                                     'Paciente não é do médico especificado.',
                                     'Patient {} is not from Doctor {}.'.format(patient_id, request.USER_ID))
@@ -188,8 +270,8 @@ class PrehabViewSet(GenericViewSet):
 
             # 1.5. Check if Task Schedule Id was created by
             # this specific doctor or a community Task Schedule (created by an admin)
-            task_schedule = TaskSchedule.objects.get(pk=data['task_schedule_id'])
-            if request.ROLE_ID != 1 and not task_schedule.doctor_can_use(doctor.user.id):
+            task_schedule = TaskSchedule.objects.select_related('created_by__role').get(pk=data['task_schedule_id'])
+            if not request.IDENTITY.is_admin and not task_schedule.doctor_can_use(request.USER_ID):
                 raise HttpException(400,
                                     'Você não é o dono deste prehab',
                                     'You are not the owner of this task schedule.')
@@ -204,50 +286,31 @@ class PrehabViewSet(GenericViewSet):
             expected_end_date = init_date + datetime.timedelta(days=7 * task_schedule.number_of_weeks)
 
             # 3. Insert new Prehab
+            prehab = Prehab(
+                patient=patient,
+                init_date=init_date,
+                expected_end_date=expected_end_date,
+                actual_end_date=None,
+                surgery_date=surgery_date,
+                number_of_weeks=task_schedule.number_of_weeks,
+                status=Prehab.PENDING,
+                created_by_id=request.USER_ID,
+                meal_seed=data.get('meal_seed', random.getrandbits(32))
+            )
+
+            # 4. Insert the Patient Task and Meal Schedules - or leave them to a plan job with ?async
+            run_async = PrehabViewSet._is_async(request)
+            if run_async:
+                # The plan job would fail without meals: refuse the prehab now, like the synchronous creation
+                DataHelper.available_meals(PatientConstraintType.objects.filter(patient=patient)
+                                           .values_list('constraint_type_id', flat=True))
+
             with transaction.atomic():
-                prehab = Prehab(
-                    patient=patient,
-                    init_date=init_date,
-                    expected_end_date=expected_end_date,
-                    actual_end_date=None,
-                    surgery_date=surgery_date,
-                    number_of_weeks=task_schedule.number_of_weeks,
-                    status=Prehab.PENDING,
-                    created_by=doctor
-                )
                 prehab.save()
-
-                # 4. Insert Patient Task Schedule
-                patient_task_schedule_work_load = DataHelper.patient_task_schedule_work_load(task_schedule)
-                patient_tasks = []
-                for row in patient_task_schedule_work_load:
-                    patient_tasks.append(PatientTaskSchedule(
-                        prehab=prehab,
-                        week_number=row['week_number'],
-                        day_number=row['day_number'],
-                        task=row['task'],
-                        expected_repetitions=1,  # row['repetitions'],
-                        actual_repetitions=None,
-                        status=PatientTaskSchedule.PENDING
-                    ))
-                PatientTaskSchedule.objects.bulk_create(patient_tasks)
-
-                # 5. Insert Patient Meal Schedule
-                constraint_types = [pct.constraint_type for pct in
-                                    PatientConstraintType.objects.filter(patient=patient).all()]
-                patient_meal_schedule = DataHelper.patient_meal_schedule(task_schedule.number_of_weeks,
-                                                                         constraint_types)
-                patient_meals = []
-                for row in patient_meal_schedule:
-                    patient_meals.append(PatientMealSchedule(
-                        prehab=prehab,
-                        week_number=row['week_number'],
-                        day_number=row['day_number'],
-                        meal_order=row['meal_order'],
-                        meal=row['meal']
-                    ))
-
-                PatientMealSchedule.objects.bulk_create(patient_meals)
+                if run_async:
+                    job = PlanJob.objects.enqueue(prehab, task_schedule)
+                else:
+                    PlanBuilder.materialize(prehab, task_schedule)
 
         except Patient.DoesNotExist as e:
             return HTTP.response(400, 'Patient with id of {} does not exist.'.format(request.data['patient_id']))
@@ -263,8 +326,50 @@ class PrehabViewSet(GenericViewSet):
         data = {
             'prehab_id': prehab.id
         }
+        if run_async:
+            data['job_id'] = job.id
+            return HTTP.response(202, '', data)
+
         return HTTP.response(201, '', data)
 
+    @staticmethod
+    def _is_async(request):
+        """ ?async, ?async=1 or ?async=true ask for a plan job - ?async=0 or ?async=false don't """
+        return 'async' in request.GET and request.GET['async'].lower() not in ('0', 'false', 'no', 'off')
+
+    @staticmethod
+    def job_status(request, pk=None):
+        try:
+            job = PlanJob.objects.select_related('prehab').get(pk=pk)
+
+            # In case it's not Admin -> only the doctor who created the prehab
+            if request.ROLE_ID != 1 and (request.ROLE_ID != 2 or job.prehab.created_by_id != request.USER_ID):
+                raise HttpException(401,
+                                    'Não tem permissões para aceder a este recurso.',
+                                    'You don\'t have access to this resource.')
+
+            data = {
+                'job_id': job.id,
+                'prehab_id': job.prehab_id,
+                'status_id': job.status,
+                'status': job.get_status_display(),
+                'attempts': job.attempts,
+                'error': job.error,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'finished_at': job.finished_at
+            }
+
+        except PlanJob.DoesNotExist:
+            return HTTP.response(404, 'Tarefa não encontrada', 'Plan job with id {} does not exist'.format(str(pk)))
+        except HttpException as e:
+            return HTTP.response(e.http_code, e.http_custom_message, e.http_detail)
+        except Exception as e:
+            return HTTP.response(400, 'Ocorreu um erro inesperado',
+                                 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
+
+        return HTTP.response(200, data=data)
+
     @staticmethod
     def update(request, pk=None):
         return HTTP.response(405)
@@ -291,6 +396,7 @@ class PrehabViewSet(GenericViewSet):
 
             prehab.actual_end_date = datetime.date.today()
             prehab.status = Prehab.CANCEL
+            prehab.change_seq = F('change_seq') + 1
             prehab.save()
 
         except Patient.DoesNotExist as e:
@@ -1,5 +1,6 @@
 from rest_framework.viewsets import GenericViewSet
 
+from prehab.helpers.CatalogCache import CatalogCache
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
 from prehab.helpers.SchemaValidator import SchemaValidator
@@ -19,7 +20,7 @@ class TaskViewSet(GenericViewSet):
         except Exception as e:
             return HTTP.response(400, 'Ocorreu um erro inesperado', 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, data=data)  # , paginator=self.paginator)
+        return HTTP.response(200, data=data, paginator=self.paginator)
 
     @staticmethod
     def retrieve(request, pk=None):
@@ -55,6 +56,7 @@ class TaskViewSet(GenericViewSet):
                 task_type=data['task_type_id']
             )
             new_task.save()
+            CatalogCache.invalidate()
 
         except HttpException as e:
             return HTTP.response(e.http_code, e.http_custom_message, e.http_detail)
@@ -2,6 +2,7 @@ from rest_framework.viewsets import GenericViewSet
 
 from prehab.helpers.HttpException import HttpException
 from prehab.helpers.HttpResponseHandler import HTTP
+from prehab.helpers.RowVersion import RowVersion
 from prehab.permissions import Permission
 from prehab_app.models import TaskSchedule
 from prehab_app.serializers.TaskSchedule import TaskScheduleSerializer
@@ -18,13 +19,20 @@ class TaskScheduleViewSet(GenericViewSet):
 
             # In case it's an Admin -> Retrieve ALL patients info
             if request.ROLE_ID == 1:
-                queryset = self.paginate_queryset(TaskSchedule.objects.all())
+                task_schedules = TaskSchedule.objects.all()
             # In case it's a Doctor -> Retrieve ALL his/her task schedules info
             elif request.ROLE_ID == 2:
-                queryset = self.paginate_queryset(TaskSchedule.objects.created_by(request.USER_ID))
+                task_schedules = TaskSchedule.objects.created_by(request.USER_ID)
             else:
                 raise HttpException(400)
 
+            etag, last_modified = RowVersion.of_queryset('task-schedules', task_schedules,
+                                                         request.ROLE_ID, request.USER_ID, request.GET.urlencode())
+            not_modified = HTTP.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            queryset = self.paginate_queryset(task_schedules)
             data = TaskScheduleSerializer(queryset, many=True).data
 
         except HttpException as e:
@@ -32,12 +40,18 @@ class TaskScheduleViewSet(GenericViewSet):
         except Exception as e:
             return HTTP.response(400, 'Ocorreu um erro inesperado', 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, data=data)  # , paginator=self.paginator)
+        return HTTP.response(200, data=data, paginator=self.paginator, etag=etag, last_modified=last_modified)
 
     @staticmethod
     def retrieve(request, pk=None):
         try:
             queryset = TaskSchedule.objects.get(pk=pk)
+
+            etag, last_modified = RowVersion.of_row('task-schedule', queryset)
+            not_modified = HTTP.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
             data = TaskScheduleSerializer(queryset, many=False).data
 
         except TaskSchedule.DoesNotExist:
@@ -49,7 +63,7 @@ class TaskScheduleViewSet(GenericViewSet):
         except Exception as e:
             return HTTP.response(400, 'Ocorreu um erro inesperado', 'Unexpected Error. {}. {}.'.format(type(e).__name__, str(e)))
 
-        return HTTP.response(200, data=data)
+        return HTTP.response(200, data=data, etag=etag, last_modified=last_modified)
 
     @staticmethod
     def create(request):
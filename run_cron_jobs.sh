@@ -1,2 +1,2 @@
-curl -X POST 'localhost:8000/api/cron/tasks'
-curl -X POST 'localhost:8000/api/cron/prehabs'
\ No newline at end of file
+python manage.py clean_tasks
+python manage.py clean_prehabs